@@ -0,0 +1,164 @@
+"""Асинхронные представления самых частых чтений API.
+
+Списки и карточки тегов и ингредиентов (автодополнение в форме рецепта)
+под ASGI-сервером не занимают поток, пока медленный клиент читает ответ:
+данные берутся из каталога ингредиентов (recipes/catalog.py) и снимка
+тегов в памяти процесса, а в базу представление обращается только за
+версиями ресурсов и, при их смене, за новыми данными. В Django 3.2 нет
+асинхронного ORM, поэтому эти обращения выполняются в пуле из
+ASYNC_VIEWS_WORKERS потоков; при 0 — в общем потоке синхронного кода
+Django, как и синхронные представления (так работают тесты). Ответы,
+включая ETag и ошибки токена, совпадают с ответами api/views.py.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import exceptions
+
+from recipes import catalog, versions
+from recipes.models import Tag
+from .authentication import CachedTokenAuthentication
+from .conditional import validators
+from .instrumentation import timed_serializer
+from .renderers import JSONRenderer
+from .serializers import TagSerializer
+from .views import IngredientViewSet
+
+TAGS = 'tags'
+
+_executor = None
+# Снимок тегов: (версия, список, словарь по id).
+_tags = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_VIEWS_WORKERS,
+            thread_name_prefix='async-views',
+        )
+    return _executor
+
+
+def call(func, args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(func, *args):
+    """Выполняет func в пуле потоков с контекстом запроса."""
+    if not settings.ASYNC_VIEWS_WORKERS:
+        return await sync_to_async(func, thread_sensitive=True)(*args)
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), copy_context().run, call, func, args
+    )
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        JSONRenderer().render(data), status=status,
+        content_type='application/json'
+    )
+
+
+def prepare(request, resource):
+    """Проверка токена и версия ресурса — одним обращением к пулу.
+
+    Неверный токен, как и в DRF, отклоняется и на открытых маршрутах.
+    """
+    try:
+        CachedTokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed as error:
+        response = json_response({'detail': error.detail}, status=401)
+        response['WWW-Authenticate'] = 'Token'
+        return response, None
+    return None, versions.get_many([resource])
+
+
+async def conditional(request, resource, build):
+    """Ответ с ETag и Last-Modified как у api.conditional.conditional_get.
+
+    build(версия) возвращает данные ответа или None, если объекта нет.
+    """
+    response, resource_versions = await run_sync(prepare, request, resource)
+    if response is not None:
+        return response
+    etag, last_modified = validators(
+        [resource, request.get_full_path()], resource_versions.values()
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        data = await build(resource_versions[resource][0])
+        if data is None:
+            return json_response(
+                {'detail': exceptions.NotFound.default_detail}, status=404
+            )
+        response = json_response(data)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def load_tags(version):
+    global _tags
+    data = timed_serializer(
+        TagSerializer(Tag.objects.all(), many=True)
+    ).data
+    _tags = (version, data, {tag['id']: tag for tag in data})
+    return _tags
+
+
+async def get_tags(version):
+    tags = _tags
+    if tags is None or tags[0] != version:
+        tags = await run_sync(load_tags, version)
+    return tags
+
+
+async def tag_list(request):
+    async def build(version):
+        return (await get_tags(version))[1]
+    return await conditional(request, TAGS, build)
+
+
+async def tag_detail(request, pk):
+    async def build(version):
+        return (await get_tags(version))[2].get(pk)
+    return await conditional(request, TAGS, build)
+
+
+async def get_catalog(version):
+    return (
+        catalog.loaded_catalog(version)
+        or await run_sync(catalog.get_catalog)
+    )
+
+
+async def ingredient_list(request):
+    async def build(version):
+        ingredients = await get_catalog(version)
+        limit = IngredientViewSet.parse_limit(request.GET.get('limit'))
+        name = request.GET.get('name')
+        if name:
+            return ingredients.search(name, limit)
+        return ingredients.all()[:limit]
+    return await conditional(request, catalog.RESOURCE, build)
+
+
+async def ingredient_detail(request, pk):
+    async def build(version):
+        return (await get_catalog(version)).get(pk)
+    return await conditional(request, catalog.RESOURCE, build)
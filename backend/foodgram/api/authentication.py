@@ -0,0 +1,165 @@
+"""Аутентификация по токену с кэшем снимков пользователей.
+
+TokenAuthentication из DRF на каждый запрос выполняет запрос
+Token + User. Здесь найденный пользователь сохраняется как снимок полей
+(без пароля): если задан TOKEN_CACHE_ALIAS — только в общем кэше Django,
+иначе в ограниченном LRU процесса. Записи живут TOKEN_CACHE_TIMEOUT
+секунд и удаляются при удалении токена (logout в djoser) и изменении
+пользователя, в том числе деактивации (см. api/signals.py). Удаление из
+общего кэша сразу видят все воркеры; LRU процесса другие воркеры не
+видят, поэтому при нескольких воркерах нужно задавать TOKEN_CACHE_ALIAS.
+"""
+import time
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+
+KEY = 'auth:token:{}'
+
+
+class LRUCache:
+    """Словарь с ограниченным размером и временем жизни записей."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.data = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.size:
+            return
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.timeout, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self.lock:
+            for key in [
+                key for key, (expires, value) in self.data.items()
+                if predicate(value)
+            ]:
+                del self.data[key]
+
+
+def snapshot_fields():
+    return [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname != 'password'
+    ]
+
+
+def make_snapshot(token):
+    return {
+        'created': token.created,
+        'user': {
+            name: getattr(token.user, name) for name in snapshot_fields()
+        },
+    }
+
+
+def restore(key, snapshot):
+    """Пользователь из снимка; пароль загрузится отдельно по обращению."""
+    fields = snapshot['user']
+    user = User.from_db(DEFAULT_DB_ALIAS, list(fields), list(fields.values()))
+    token = Token(key=key, user=user, created=snapshot['created'])
+    return user, token
+
+
+class TokenCache:
+
+    def __init__(self, size, timeout, alias=None):
+        # С общим кэшем локальная копия не хранится: её не сбросить
+        # в других воркерах.
+        self.local = LRUCache(0 if alias else size, timeout)
+        self.timeout = timeout
+        self.alias = alias
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    @staticmethod
+    def shared_key(key):
+        return KEY.format(sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        snapshot = self.local.get(key)
+        if snapshot is None and self.shared is not None:
+            snapshot = self.shared.get(self.shared_key(key))
+            if snapshot is not None:
+                self.local.set(key, snapshot)
+        return snapshot
+
+    def set(self, key, snapshot):
+        self.local.set(key, snapshot)
+        if self.shared is not None:
+            self.shared.set(self.shared_key(key), snapshot, self.timeout)
+
+    def invalidate(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self.shared_key(key))
+
+    def invalidate_user(self, user_id):
+        self.local.delete_where(
+            lambda snapshot: snapshot['user']['id'] == user_id
+        )
+        if self.shared is not None:
+            self.shared.delete_many([
+                self.shared_key(key) for key in Token.objects.filter(
+                    user_id=user_id
+                ).values_list('key', flat=True)
+            ])
+
+
+token_cache = TokenCache(
+    size=getattr(settings, 'TOKEN_CACHE_SIZE', 1000),
+    timeout=getattr(settings, 'TOKEN_CACHE_TIMEOUT', 60),
+    alias=getattr(settings, 'TOKEN_CACHE_ALIAS', None),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе при попадании в кэш."""
+
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(key)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, make_snapshot(token))
+            return user, token
+        user, token = restore(key, snapshot)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return user, token
@@ -0,0 +1,74 @@
+"""Кэш ответов ленты рецептов.
+
+Без флагов пользователя (см. api/relations.py) ответ ленты зависит
+только от параметров запроса, поэтому готовые данные ответа кэшируются
+по нормализованной строке запроса и общие для всех пользователей.
+Поколение ключей совпадает с версией ресурса recipes, которая меняется
+при изменении рецептов, тегов и ингредиентов (см. recipes/versions.py
+и api/signals.py).
+"""
+from collections import Counter
+from hashlib import sha1
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+
+from recipes import versions
+
+
+class FeedCache:
+    resource = 'recipes'
+
+    def __init__(self, alias='default', timeout=60):
+        self.alias = alias
+        self.timeout = timeout
+        self.stats = Counter()
+        self._lock = Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def snapshot(self):
+        """Копия счётчиков hits, misses и invalidations процесса."""
+        with self._lock:
+            return dict(self.stats)
+
+    def generation(self):
+        return versions.get(self.resource)[0]
+
+    def invalidate(self):
+        versions.bump(self.resource)
+        self.count('invalidations')
+
+    def key(self, request):
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+        raw = '|'.join((
+            request.scheme, request.get_host(), request.path,
+            '&'.join(f'{name}={value}' for name, value in params)
+        ))
+        digest = sha1(raw.encode()).hexdigest()
+        return f'api:feed:{self.generation()}:{digest}'
+
+    def get(self, request):
+        data = self.cache.get(self.key(request))
+        self.count('hits' if data is not None else 'misses')
+        return data
+
+    def set(self, request, data):
+        self.cache.set(self.key(request), data, self.timeout)
+
+
+feed_cache = FeedCache(
+    alias=getattr(settings, 'FEED_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'FEED_CACHE_TIMEOUT', 60),
+)
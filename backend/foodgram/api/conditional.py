@@ -0,0 +1,55 @@
+from functools import wraps
+from hashlib import sha1
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from recipes import versions
+
+
+def user_resource(user_id):
+    """Ресурс связей пользователя: избранное, корзина, подписки."""
+    return f'relations:{user_id}'
+
+
+def validators(parts, resource_versions):
+    """ETag и Last-Modified по частям ключа и версиям ресурсов."""
+    resource_versions = list(resource_versions)
+    parts = [*parts, *(version for version, _ in resource_versions)]
+    etag = quote_etag(sha1('|'.join(parts).encode()).hexdigest())
+    last_modified = int(max(
+        modified for _, modified in resource_versions
+    ).timestamp())
+    return etag, last_modified
+
+
+def conditional_get(resource, per_user=False):
+    """Отвечает 304 по ETag/Last-Modified, не вызывая обработчик.
+
+    Валидаторы строятся из версии ресурса, пути с параметрами и, при
+    per_user, версии связей текущего пользователя.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            resources = [resource]
+            parts = [resource, request.get_full_path()]
+            if per_user and request.user.is_authenticated:
+                resources.append(user_resource(request.user.pk))
+                parts.append(str(request.user.pk))
+            etag, last_modified = validators(
+                parts, versions.get_many(resources).values()
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+            if per_user:
+                patch_vary_headers(response, ('Authorization',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,109 @@
+import binascii
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+CHUNK_SIZE = 64 * 1024
+HEADER_CHECK_SIZE = 64 * 1024
+BASE64_MARKER = ';base64,'
+
+
+class StreamingBase64ImageField(serializers.ImageField):
+    """Картинка в виде data-URI в base64 или файла из multipart-формы.
+
+    Размер по длине base64 проверяется до декодирования. Данные
+    декодируются частями во временный файл, а размеры картинки
+    читаются из заголовка по первым декодированным байтам, так что
+    память на запрос не зависит от размера картинки.
+    """
+    default_error_messages = {
+        'invalid_base64': 'Картинка должна быть data-URI в base64.',
+        'too_large': 'Картинка больше {max_size} байт.',
+        'too_many_pixels': (
+            'Картинка больше {max_pixels} пикселей ({width}x{height}).'
+        ),
+        'bad_format': 'Допустимые форматы: {formats}.',
+    }
+    FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+    def __init__(self, max_size=None, max_pixels=None, **kwargs):
+        self.max_size = max_size or settings.RECIPE_IMAGE_MAX_SIZE
+        self.max_pixels = max_pixels or settings.RECIPE_IMAGE_MAX_PIXELS
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            if data.size > self.max_size:
+                self.fail('too_large', max_size=self.max_size)
+            extension = self.check_header(data)
+            data.seek(0)
+            data.name = f'{uuid.uuid4()}.{extension}'
+            return super().to_internal_value(data)
+        if not isinstance(data, str):
+            self.fail('invalid_base64')
+        start = data.find(BASE64_MARKER)
+        start = 0 if start == -1 else start + len(BASE64_MARKER)
+        if (len(data) - start) * 3 // 4 > self.max_size + 2:
+            self.fail('too_large', max_size=self.max_size)
+        file = self.decode(data, start)
+        return super().to_internal_value(file)
+
+    def decode(self, data, start):
+        """Декодирует base64 из data[start:] во временный файл."""
+        file = TemporaryUploadedFile('upload', None, 0, None)
+        try:
+            extension = None
+            pending = ''
+            for offset in range(start, len(data), CHUNK_SIZE):
+                pending += ''.join(data[offset:offset + CHUNK_SIZE].split())
+                ready = len(pending) - len(pending) % 4
+                file.write(binascii.a2b_base64(pending[:ready]))
+                pending = pending[ready:]
+                if extension is None and file.tell() >= HEADER_CHECK_SIZE:
+                    extension = self.check_header(file, partial=True)
+            if pending:
+                file.write(binascii.a2b_base64(pending))
+            file.size = file.tell()
+            if file.size > self.max_size:
+                self.fail('too_large', max_size=self.max_size)
+            if extension is None:
+                extension = self.check_header(file)
+        except ValueError:
+            file.close()
+            self.fail('invalid_base64')
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.seek(0)
+        file.name = f'{uuid.uuid4()}.{extension}'
+        return file
+
+    def check_header(self, file, partial=False):
+        """Проверяет формат и размеры картинки по её заголовку.
+
+        Для недописанного файла (partial) возвращает None, если заголовок
+        ещё не прочитать целиком.
+        """
+        position = file.tell()
+        file.flush()
+        file.seek(0)
+        try:
+            image = Image.open(file)
+        except Exception:
+            if partial:
+                return None
+            self.fail('invalid_image')
+        finally:
+            file.seek(position)
+        if image.format not in self.FORMATS:
+            self.fail('bad_format', formats=', '.join(self.FORMATS.values()))
+        width, height = image.size
+        if width * height > self.max_pixels:
+            self.fail(
+                'too_many_pixels', max_pixels=self.max_pixels,
+                width=width, height=height
+            )
+        return self.FORMATS[image.format]
@@ -1,20 +1,45 @@
-from django.db.models import ExpressionWrapper, Q, BooleanField
-from django_filters import AllValuesMultipleFilter, BooleanFilter, FilterSet
+from django import forms
+from django.core.cache import cache
+from django.db.models import (BooleanField, Exists, ExpressionWrapper,
+                              OuterRef, Q)
+from django_filters import (BooleanFilter, CharFilter, FilterSet,
+                            MultipleChoiceFilter)
 from django_filters.widgets import BooleanWidget
-from django_filters.rest_framework import Filter
-from rest_framework.filters import SearchFilter
-from recipes.models import Recipe
+from recipes import versions
+from recipes.models import Ingredient, Recipe, Tag
+
+
+class AnyValueMultipleField(forms.MultipleChoiceField):
+    """Список значений без проверки по заранее известным вариантам."""
+
+    def valid_value(self, value):
+        return True
+
+
+class ValuesMultipleFilter(MultipleChoiceFilter):
+    """Аналог AllValuesMultipleFilter без SELECT DISTINCT для choices."""
+    field_class = AnyValueMultipleField
+
+
+def tag_ids_by_slug(slugs):
+    """Переводит slug тегов в id по закэшированной карте."""
+    key = f'api:tag_slugs:{versions.get("tags")[0]}'
+    slug_map = cache.get(key)
+    if slug_map is None:
+        slug_map = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, slug_map, None)
+    return [slug_map[slug] for slug in slugs if slug in slug_map]
 
 
 class RecipeFilter(FilterSet):
-    author = AllValuesMultipleFilter(field_name='author__id')
-    tags = AllValuesMultipleFilter(field_name='tags__slug')
+    author = ValuesMultipleFilter(field_name='author__id', distinct=False)
+    tags = ValuesMultipleFilter(method='filter_tags')
     is_in_shopping_cart = BooleanFilter(
-        field_name='is_in_shopping_cart',
+        method='filter_is_in_shopping_cart',
         widget=BooleanWidget()
     )
     is_favorited = BooleanFilter(
-        field_name='is_favorited',
+        method='filter_is_favorited',
         widget=BooleanWidget()
     )
 
@@ -22,16 +47,54 @@ class RecipeFilter(FilterSet):
         model = Recipe
         fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
 
+    def filter_by_user_rows(self, queryset, name, value, lookup):
+        """Для True соединяет рецепты со строками пользователя.
+
+        Запрос строится от небольшого списка избранного или корзины
+        пользователя, а не вычисляет Exists для каждого рецепта.
+        """
+        user = getattr(self.request, 'user', None)
+        if user is None or user.is_anonymous:
+            return queryset if not value else queryset.none()
+        if not value:
+            return queryset.exclude(**{lookup: user})
+        return queryset.filter(**{lookup: user})
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_by_user_rows(
+            queryset, name, value, 'favoritting__user'
+        )
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_by_user_rows(
+            queryset, name, value, 'shopping_cart__user'
+        )
+
+    def filter_tags(self, queryset, name, value):
+        tag_ids = tag_ids_by_slug(value)
+        if not tag_ids:
+            return queryset.none()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__in=tag_ids
+            )
+        ))
 
-class IngredientSearchFilter(SearchFilter):
-    name = Filter(
-        method='filter_name'
-    )
+
+class IngredientFilter(FilterSet):
+    """Автодополнение: сначала совпадения по началу названия."""
+    name = CharFilter(method='filter_name')
+
+    class Meta:
+        model = Ingredient
+        fields = ['name']
 
     def filter_name(self, queryset, name, value):
-        data = queryset.filter(name__contains=value)
+        data = queryset.filter(name__icontains=value)
         startswith = ExpressionWrapper(
-            Q(name__startswith=value),
+            Q(name__istartswith=value),
             output_field=BooleanField()
         )
-        return data.annotate(startswith=startswith).order_by('-startswith')
+        return data.annotate(startswith=startswith).order_by(
+            '-startswith', 'name'
+        )
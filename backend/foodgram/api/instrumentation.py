@@ -0,0 +1,201 @@
+"""Замеры запросов: SQL, сериализация, размер ответа.
+
+Каждое соединение с базой получает обёртку execute (см. install), которая
+записывает SQL-запросы в статистику текущего HTTP-запроса. Время
+сериализации складывается из получения serializer.data у сериализаторов,
+созданных представлениями (см. timed_serializer), и кодирования в JSON
+(api/renderers.py). Статистика хранится в contextvar и поэтому видна и в
+потоках, куда запрос передаётся через asgiref.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+current = ContextVar('request_stats', default=None)
+
+PLACEHOLDERS = re.compile(r'%s(?:\s*,\s*%s)+')
+NUMBERS = re.compile(r'\b\d+\b')
+
+
+def fingerprint(sql):
+    """SQL без конкретных значений: списки IN и числа сворачиваются."""
+    return NUMBERS.sub('?', PLACEHOLDERS.sub('%s, ...', sql))
+
+
+class RequestStats:
+
+    def __init__(self, request):
+        self.method = request.method
+        self.view = 'unresolved'
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        self.render_time = 0.0
+        self.response_size = 0
+        self.executed = Counter()
+        self.fingerprints = defaultdict(lambda: [0, 0.0])
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.executed.values())
+
+    def record_query(self, sql, params, duration):
+        self.queries += 1
+        self.db_time += duration
+        try:
+            self.executed[sql, repr(params)] += 1
+        except Exception:
+            self.executed[sql, id(params)] += 1
+        entry = self.fingerprints[fingerprint(sql)]
+        entry[0] += 1
+        entry[1] += duration
+
+    def server_timing(self):
+        app_time = max(
+            self.duration - self.db_time - self.serialize_time
+            - self.render_time, 0
+        )
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.queries} queries, {self.duplicates} duplicates"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'app;dur={app_time * 1000:.1f}',
+            f'total;dur={self.duration * 1000:.1f}',
+        ))
+
+    def slowest(self, limit=5):
+        return sorted(
+            self.fingerprints.items(), key=lambda item: -item[1][1]
+        )[:limit]
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, params, time.perf_counter() - started)
+
+
+def install(connection):
+    """Подключает к соединению замер SQL-запросов."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_data(data):
+    """Свойство data сериализатора с замером времени сериализации.
+
+    Вложенные вызовы (SerializerMethodField с другим сериализатором)
+    входят во внешний, а SQL-запросы, выполненные по ходу, вычитаются:
+    их время уже учтено в db.
+    """
+    getter = data.fget
+
+    @wraps(getter)
+    def timed(serializer):
+        stats = current.get()
+        if stats is None or stats.serializing:
+            return getter(serializer)
+        stats.serializing = True
+        db_time = stats.db_time
+        started = time.perf_counter()
+        try:
+            return getter(serializer)
+        finally:
+            stats.serializing = False
+            stats.serialize_time += max(
+                time.perf_counter() - started - (stats.db_time - db_time), 0
+            )
+    timed.timed = True
+    return property(timed)
+
+
+_timed_classes = {}
+
+
+def timed_serializer(serializer):
+    """Включает замер получения data у одного сериализатора.
+
+    Класс экземпляра заменяется подклассом с замеренным свойством data;
+    сами классы DRF и остальные сериализаторы не меняются.
+    """
+    serializer_class = type(serializer)
+    if getattr(serializer_class.data.fget, 'timed', False):
+        return serializer
+    timed_class = _timed_classes.get(serializer_class)
+    if timed_class is None:
+        timed_class = _timed_classes.setdefault(serializer_class, type(
+            serializer_class.__name__, (serializer_class,), {
+                '__module__': serializer_class.__module__,
+                'data': timed_data(serializer_class.data),
+            }
+        ))
+    serializer.__class__ = timed_class
+    return serializer
+
+
+def start(request):
+    stats = RequestStats(request)
+    return stats, current.set(stats)
+
+
+def finish(request, response, stats, token):
+    current.reset(token)
+    stats.duration = time.perf_counter() - stats.started
+    match = request.resolver_match
+    if match is not None:
+        stats.view = match.view_name
+    if not response.streaming:
+        stats.response_size = len(response.content)
+    registry.observe(stats, response.status_code)
+    if settings.SERVER_TIMING:
+        response['Server-Timing'] = stats.server_timing()
+    threshold = settings.SLOW_REQUEST_THRESHOLD
+    if threshold and stats.duration * 1000 >= threshold:
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f мс, SQL: %s за %.0f мс, '
+            'повторов %s\n%s',
+            request.method, request.get_full_path(), stats.view,
+            stats.duration * 1000, stats.queries, stats.db_time * 1000,
+            stats.duplicates,
+            '\n'.join(
+                f'  {count} x {duration * 1000:.1f} мс: {sql}'
+                for sql, (count, duration) in stats.slowest()
+            ),
+        )
+    return response
+
+
+@sync_and_async_middleware
+def instrumentation_middleware(get_response):
+    """Считает SQL-запросы, время и размер ответа каждого запроса."""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats, token = start(request)
+            response = await get_response(request)
+            return finish(request, response, stats, token)
+    else:
+        def middleware(request):
+            stats, token = start(request)
+            response = get_response(request)
+            return finish(request, response, stats, token)
+    return middleware
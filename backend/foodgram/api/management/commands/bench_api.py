@@ -0,0 +1,179 @@
+import json
+import statistics
+import time
+from itertools import combinations
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p95 и число SQL-запросов для ленты рецептов со всеми '
+        'сочетаниями фильтров, подписок, скачивания списка покупок и '
+        'поиска ингредиентов. Данные можно создать командой generate_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя; по умолчанию — с наибольшим числом '
+                 'подписок.'
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Отключить кэш, чтобы замерять запросы без попаданий.'
+        )
+        parser.add_argument('--output', help='Сохранить результаты в JSON.')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего запуска для сравнения.'
+        )
+
+    def handle(self, *args, **options):
+        viewer = self.viewer(options['user'])
+        client = Client(HTTP_AUTHORIZATION=(
+            f'Token {Token.objects.get_or_create(user=viewer)[0].key}'
+        ))
+        caches = NO_CACHE if options['cold'] else settings.CACHES
+        results = {}
+        # Асинхронные представления обращаются к базе в потоке запроса,
+        # иначе их запросы не попадут в замер.
+        with override_settings(CACHES=caches, ASYNC_VIEWS_WORKERS=0):
+            for name, url in self.scenarios(viewer):
+                results[name] = self.measure(client, url, options)
+                self.stdout.write(self.format(name, results[name]))
+        report = {
+            'meta': self.meta(viewer, options),
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                self.compare(json.load(file)['results'], results)
+
+    @staticmethod
+    def viewer(user_id):
+        if user_id is not None:
+            return User.objects.get(pk=user_id)
+        viewer = User.objects.annotate(
+            follows=Count('follower')
+        ).order_by('-follows', 'id').first()
+        if viewer is None:
+            raise CommandError('Нет пользователей: запустите generate_data.')
+        return viewer
+
+    @staticmethod
+    def scenarios(viewer):
+        author = User.objects.order_by('-recipes_count', 'id').first()
+        slugs = list(Tag.objects.order_by('id').values_list(
+            'slug', flat=True
+        )[:2])
+        filters = {
+            'author': [author.pk],
+            'tags': slugs,
+            'is_favorited': [1],
+            'is_in_shopping_cart': [1],
+        }
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                query = urlencode(
+                    {name: filters[name] for name in names}, doseq=True
+                )
+                yield (
+                    f'recipes[{"+".join(names)}]', f'/api/recipes/?{query}'
+                )
+        yield (
+            'subscriptions', '/api/users/subscriptions/?recipes_limit=3'
+        )
+        for file_format in ('txt', 'csv', 'json'):
+            yield (
+                f'download_shopping_cart[{file_format}]',
+                '/api/recipes/download_shopping_cart/'
+                f'?file_format={file_format}'
+            )
+        names = Ingredient.objects.order_by('id').values_list(
+            'name', flat=True
+        )[:50]
+        prefixes = dict.fromkeys(
+            name[:length] for length in (1, 3, 5) for name in names
+        )
+        for prefix in list(prefixes)[:6]:
+            yield (
+                f'ingredients[{prefix}]',
+                f'/api/ingredients/?{urlencode({"name": prefix})}'
+            )
+
+    @staticmethod
+    def measure(client, url, options):
+        timings = []
+        queries = 0
+        for run in range(options['warmup'] + options['repeat']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                raise CommandError(f'{url}: {response.status_code}')
+            if run >= options['warmup']:
+                timings.append(elapsed * 1000)
+                queries = max(queries, len(captured))
+        timings.sort()
+        return {
+            'url': url,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+            'queries': queries,
+        }
+
+    @staticmethod
+    def format(name, result):
+        return (
+            f'{name}: p50={result["p50_ms"]} мс, p95={result["p95_ms"]} мс, '
+            f'запросов {result["queries"]}'
+        )
+
+    @staticmethod
+    def meta(viewer, options):
+        return {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'cold': options['cold'],
+            'repeat': options['repeat'],
+            'viewer': viewer.pk,
+            'users': User.objects.count(),
+            'recipes': Recipe.objects.count(),
+            'ingredients': Ingredient.objects.count(),
+        }
+
+    def compare(self, before, after):
+        self.stdout.write('Сравнение p50 с предыдущим запуском:')
+        for name, result in after.items():
+            if name not in before:
+                continue
+            old, new = before[name]['p50_ms'], result['p50_ms']
+            change = (new - old) / old * 100 if old else 0
+            self.stdout.write(
+                f'{name}: {old} → {new} мс ({change:+.0f}%), запросов '
+                f'{before[name]["queries"]} → {result["queries"]}'
+            )
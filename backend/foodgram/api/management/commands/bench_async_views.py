@@ -0,0 +1,173 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from itertools import cycle
+from types import ModuleType
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test import RequestFactory, override_settings
+from django.urls import include, path
+
+from api import urls as api_urls
+
+PATHS = (
+    '/api/ingredients/?name=са',
+    '/api/ingredients/?name=мол&limit=10',
+    '/api/tags/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность WSGI и ASGI на горячих '
+        'GET-маршрутах (теги, поиск ингредиентов) при медленных клиентах: '
+        'синхронные представления против асинхронных из api/async_views.py. '
+        'Запросы выполняются в процессе, без сети; медленный клиент '
+        'моделируется задержкой при отдаче тела ответа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=64)
+        parser.add_argument('--requests', type=int, default=640)
+        parser.add_argument(
+            '--delay', type=float, default=0.05,
+            help='Сколько секунд клиент читает ответ.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.ASYNC_VIEWS_WORKERS,
+            help='Потоков WSGI-сервера и пула асинхронных представлений.'
+        )
+        parser.add_argument('--path', action='append', dest='paths')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or list(PATHS)
+        self.stdout.write(
+            f'Клиентов: {options["clients"]}, запросов: '
+            f'{options["requests"]}, задержка клиента: {options["delay"]} с, '
+            f'потоков: {options["workers"]}'
+        )
+        sync_urls, async_urls = self.urlconfs()
+        with override_settings(ASYNC_VIEWS_WORKERS=options['workers']):
+            for title, runner, urlconf in (
+                ('wsgi', self.run_wsgi, sync_urls),
+                ('asgi, синхронные представления', self.run_asgi, sync_urls),
+                ('asgi, асинхронные представления', self.run_asgi,
+                 async_urls),
+            ):
+                with override_settings(ROOT_URLCONF=urlconf):
+                    self.report(title, asyncio.run(
+                        self.run_clients(runner, paths, options)
+                    ))
+
+    @staticmethod
+    def urlconfs():
+        """Корневые маршруты без асинхронных представлений и с ними."""
+        root = import_module(settings.ROOT_URLCONF)
+        others = [
+            pattern for pattern in root.urlpatterns
+            if getattr(pattern, 'namespace', None) != 'api'
+        ]
+        sync_patterns = [
+            pattern for pattern in api_urls.urlpatterns
+            if pattern not in api_urls.async_urlpatterns
+        ]
+        result = []
+        for name, api_patterns in (
+            ('sync_urls', sync_patterns),
+            ('async_urls', api_urls.async_urlpatterns + sync_patterns),
+        ):
+            urlconf = ModuleType(name)
+            urlconf.urlpatterns = [
+                path('api/', include((api_patterns, 'api'), namespace='api')),
+                *others,
+            ]
+            result.append(urlconf)
+        return result
+
+    async def run_clients(self, runner, paths, options):
+        handler = runner(options)
+        requests = iter(range(options['requests']))
+        path_cycle = cycle(paths)
+        timings = []
+        statuses = set()
+
+        async def client():
+            for _ in requests:
+                started = time.perf_counter()
+                statuses.add(await handler(next(path_cycle)))
+                timings.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['clients'])))
+        return timings, time.perf_counter() - started, statuses
+
+    def run_wsgi(self, options):
+        application = get_wsgi_application()
+        pool = ThreadPoolExecutor(max_workers=options['workers'])
+        factory = RequestFactory()
+
+        def handle(path):
+            status = []
+            environ = factory.get(path).environ
+            response = application(
+                environ, lambda code, headers: status.append(code)
+            )
+            try:
+                b''.join(response)
+                # Синхронный воркер занят, пока клиент читает ответ.
+                time.sleep(options['delay'])
+            finally:
+                response.close()
+            return int(status[0].split()[0])
+
+        async def request(path):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, handle, path)
+
+        return request
+
+    def run_asgi(self, options):
+        application = get_asgi_application()
+
+        async def request(path):
+            url = urlsplit(path)
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'},
+                'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                'path': url.path, 'raw_path': url.path.encode(),
+                'query_string': url.query.encode(), 'root_path': '',
+                'headers': [(b'host', b'testserver')],
+                'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            }
+            status = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif not message.get('more_body'):
+                    await asyncio.sleep(options['delay'])
+
+            await application(scope, receive, send)
+            return status[0]
+
+        return request
+
+    def report(self, title, result):
+        timings, elapsed, statuses = result
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{title}: {len(timings) / elapsed:.1f} запросов/с, '
+            f'p50={statistics.median(timings) * 1000:.1f} мс, '
+            f'p95={p95 * 1000:.1f} мс, '
+            f'статусы {sorted(statuses)}'
+        )
@@ -0,0 +1,83 @@
+import csv
+import os
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.filters import IngredientFilter
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет автодополнение ингредиентов на каталоге, увеличенном '
+        'в --scale раз. Все вставленные строки откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=100)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        path = os.path.join(settings.BASE_DIR, 'data/ingredients.csv')
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = [row for row in csv.reader(f) if row]
+        rnd = random.Random(options['seed'])
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=f'{name} #{copy}', measurement_unit=unit
+                    )
+                    for copy in range(options['scale'])
+                    for name, unit in rows
+                ),
+                batch_size=5000,
+                ignore_conflicts=True
+            )
+            self.stdout.write(
+                f'Ингредиентов в каталоге: {Ingredient.objects.count()}'
+            )
+            words = [name for name, _ in rows]
+            prefixes = [
+                rnd.choice(words)[:rnd.randint(1, 4)]
+                for _ in range(options['queries'])
+            ]
+            substrings = []
+            for _ in range(options['queries']):
+                word = rnd.choice(words)
+                start = rnd.randint(0, max(0, len(word) - 3))
+                substrings.append(word[start:start + 3])
+            for title, queries in (
+                ('prefix', prefixes), ('substring', substrings)
+            ):
+                timings = self.measure(queries, options['limit'])
+                self.stdout.write(
+                    f'{title}: p50={statistics.median(timings):.2f} ms '
+                    f'p95={self.percentile(timings, 95):.2f} ms '
+                    f'max={max(timings):.2f} ms'
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(queries, limit):
+        timings = []
+        for value in queries:
+            started = time.perf_counter()
+            list(IngredientFilter(
+                {'name': value}, queryset=Ingredient.objects.all()
+            ).qs[:limit])
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    @staticmethod
+    def percentile(values, percent):
+        values = sorted(values)
+        index = min(len(values) - 1, round(percent / 100 * len(values)))
+        return values[index]
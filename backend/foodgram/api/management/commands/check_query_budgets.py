@@ -0,0 +1,315 @@
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.urls import router
+from recipes.models import (Favorite, Ingredient, IngredientsAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+PAGE_SIZES = (1, 6, 24)
+# Кэш отключается, чтобы замерять запросы без попаданий в кэш ленты,
+# каталога и счётчиков страниц; кэш токенов сбрасывается перед каждым
+# вызовом.
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+GIF = (
+    'data:image/gif;base64,'
+    'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
+)
+# Методы, которые меняют объект: на маршрутах -detail они вызываются на
+# объекте пользователя запроса (own_<basename> в seed), если такой есть.
+OWN_OBJECT_METHODS = ('put', 'patch', 'delete')
+# Вход и выход djoser (djoser.urls.authtoken) — не вьюсеты роутера,
+# поэтому их бюджеты объявлены здесь.
+TOKEN_BUDGETS = {'login': 3, 'logout': 3}
+PASSWORD = 'budget-Pa55word'
+
+
+class Command(BaseCommand):
+    help = (
+        'Вызывает все маршруты api/urls.py на тестовых данных и проверяет '
+        'число SQL-запросов: оно не должно расти с размером страницы или '
+        'тела запроса и превышать query_budgets представления. Действия '
+        'записи проверяются, если для них объявлен бюджет. Данные '
+        'откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=60)
+        parser.add_argument('--authors', type=int, default=12)
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Показать число запросов для каждого вызова.'
+        )
+
+    def handle(self, *args, **options):
+        self.verbose = options['verbose']
+        # Асинхронные представления (ASYNC_VIEWS) обращаются к базе в потоке
+        # команды: иначе они не видят данных транзакции и не попадут в замер.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            CACHES=NO_CACHE, MEDIA_ROOT=media_root, IMAGE_VARIANTS_WORKERS=0,
+            ASYNC_VIEWS_WORKERS=0
+        ), transaction.atomic():
+            objects = self.seed(options)
+            self.token = objects['token']
+            client = Client(HTTP_AUTHORIZATION=f'Token {self.token}')
+            errors = []
+            checked = 0
+            for pattern in self.patterns():
+                view = pattern.callback
+                budgets = getattr(view.cls, 'query_budgets', {})
+                for method, action in list(view.actions.items()):
+                    if method != 'get' and action not in budgets:
+                        continue
+                    payload = self.payload(pattern, action, objects)
+                    if method in ('put', 'patch') and payload is None:
+                        continue
+                    url = self.url(pattern, objects, method)
+                    counts = self.measure(
+                        client, method, url,
+                        self.sizes(pattern, method, payload), payload
+                    )
+                    checked += 1
+                    errors.extend(self.check(
+                        view.cls.__name__, action, url, counts, budgets
+                    ))
+            for action, token_client, payload in self.token_routes(objects):
+                url = reverse(f'api:{action}')
+                counts = self.measure(
+                    token_client, 'post', url, (None,), payload
+                )
+                checked += 1
+                errors.extend(self.check(
+                    'djoser', action, url, counts, TOKEN_BUDGETS
+                ))
+            transaction.set_rollback(True)
+        for error in errors:
+            self.stderr.write(error)
+        if errors:
+            raise CommandError(f'Нарушений бюджета запросов: {len(errors)}')
+        self.stdout.write(f'Проверено действий: {checked}, нарушений нет')
+
+    @staticmethod
+    def patterns():
+        """Маршруты вьюсетов роутера без дублей с суффиксом формата."""
+        seen = set()
+        for pattern in router.urls:
+            if (
+                not hasattr(pattern.callback, 'actions')
+                or pattern.name in seen
+                or 'format' in str(pattern.pattern)
+            ):
+                continue
+            seen.add(pattern.name)
+            yield pattern
+
+    @staticmethod
+    def url(pattern, objects, method):
+        lookups = set(pattern.pattern.regex.groupindex) - {'format'}
+        if not lookups:
+            return reverse(f'api:{pattern.name}')
+        basename = pattern.callback.initkwargs['basename']
+        pk = objects[basename]
+        if (
+            method in OWN_OBJECT_METHODS
+            and pattern.name.endswith('-detail')
+        ):
+            pk = objects.get(f'own_{basename}', pk)
+        return reverse(f'api:{pattern.name}', kwargs={lookups.pop(): pk})
+
+    def payload(self, pattern, action, objects):
+        """Тело запроса действия: функция от размера или None.
+
+        Рецепт записывается с числом ингредиентов, равным размеру, чтобы
+        проверить, что число запросов от него не зависит.
+        """
+        basename = pattern.callback.initkwargs['basename']
+        if basename == 'recipe' and action in (
+            'create', 'update', 'partial_update'
+        ):
+            return lambda size: {
+                'name': f'budget_{action}_{size}', 'text': 'budget',
+                'cooking_time': 1, 'image': GIF,
+                'tags': objects['tags'],
+                'ingredients': [
+                    {'id': pk, 'amount': 1}
+                    for pk in objects['ingredients'][:size]
+                ],
+            }
+        if basename == 'user' and action == 'create':
+            return lambda size: {
+                'email': f'budget_new_{size}@example.com',
+                'username': f'budget_new_{size}',
+                'first_name': 'Новый', 'last_name': 'Пользователь',
+                'password': PASSWORD,
+            }
+        return None
+
+    @staticmethod
+    def token_routes(objects):
+        """Вход пользователя запроса и выход другого пользователя.
+
+        Выход удаляет токен, поэтому проверяется последним и с отдельным
+        токеном.
+        """
+        yield 'login', Client(), lambda size: {
+            'email': objects['email'], 'password': PASSWORD
+        }
+        yield 'logout', Client(
+            HTTP_AUTHORIZATION=f'Token {objects["logout_token"]}'
+        ), lambda size: {}
+
+    @staticmethod
+    def sizes(pattern, method, payload):
+        """Размеры страницы для списков, размеры тела для записи."""
+        if payload is not None or method == 'get' and pattern.name.endswith(
+            ('-list', '-subscriptions')
+        ):
+            return PAGE_SIZES
+        return (None,)
+
+    def measure(self, client, method, url, sizes, payload=None):
+        """Число запросов для каждого размера страницы или тела."""
+        counts = {}
+        if method == 'get':
+            # Первый вызов создаёт строки версий ресурсов: сигналы при
+            # заполнении меняют версии только после коммита, а его нет.
+            getattr(client, method)(url)
+        for size in sizes:
+            if payload is not None:
+                params = payload(size)
+                kwargs = {
+                    'data': json.dumps(params),
+                    'content_type': 'application/json',
+                }
+            else:
+                params = {} if size is None else {
+                    'limit': size, 'recipes_limit': size
+                }
+                kwargs = {'data': params}
+            token_cache.invalidate(self.token)
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, method)(url, **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{method.upper()} {url}: {response.status_code} '
+                    f'{response.content[:500].decode(errors="replace")}'
+                )
+            counts[size] = len(queries)
+            if self.verbose:
+                self.stdout.write(
+                    f'{method.upper()} {url} {size}: {len(queries)}'
+                )
+        return counts
+
+    @staticmethod
+    def check(viewset, action, url, counts, budgets):
+        errors = []
+        label = f'{viewset}.{action} ({url})'
+        if len(set(counts.values())) > 1:
+            errors.append(
+                f'{label}: число запросов зависит от размера страницы: '
+                f'{counts}'
+            )
+        budget = budgets.get(action)
+        if budget is None:
+            errors.append(f'{label}: не объявлен бюджет в query_budgets')
+        elif max(counts.values()) > budget:
+            errors.append(
+                f'{label}: {max(counts.values())} запросов '
+                f'при бюджете {budget}'
+            )
+        return errors
+
+    def seed(self, options):
+        """Небольшой, но разнообразный набор данных.
+
+        Объекты создаются по одному: bulk_create не на всех СУБД
+        возвращает первичные ключи.
+        """
+        viewer = User.objects.create(
+            username='budget_viewer', email='budget_viewer@example.com'
+        )
+        viewer.set_password(PASSWORD)
+        viewer.save(update_fields=['password'])
+        authors = [
+            User.objects.create(
+                username=f'budget_author_{number}',
+                email=f'budget_author_{number}@example.com'
+            ) for number in range(options['authors'])
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'budget_{number}', color=f'#00000{number}',
+                slug=f'budget_{number}'
+            ) for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'budget_{number}', measurement_unit='г'
+            ) for number in range(30)
+        ]
+        recipes = [
+            Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'budget_{number}', image='recipe_images/budget.jpg',
+                text='', cooking_time=1 + number % 60
+            ) for number in range(options['recipes'])
+        ]
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for number, recipe in enumerate(recipes)
+            for tag in tags[:1 + number % len(tags)]
+        )
+        IngredientsAmount.objects.bulk_create(
+            IngredientsAmount(
+                recipe=recipe,
+                ingredient=ingredients[(number + shift) % len(ingredients)],
+                amount=1 + shift
+            )
+            for number, recipe in enumerate(recipes)
+            for shift in range(3 + number % 4)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=viewer, author=author) for author in authors
+        )
+        for recipe in recipes[::2]:
+            Favorite.objects.create(user=viewer, recipe=recipe)
+        for recipe in recipes[::3]:
+            ShoppingCart.objects.create(user=viewer, recipe=recipe)
+        free_recipe = next(
+            recipe for number, recipe in enumerate(recipes)
+            if number % 2 and number % 3
+        )
+        free_author = User.objects.create(
+            username='budget_free', email='budget_free@example.com'
+        )
+        own_recipe = Recipe.objects.create(
+            author=viewer, name='budget_own',
+            image='recipe_images/budget.jpg', text='', cooking_time=1
+        )
+        own_recipe.tags.set(tags)
+        return {
+            'token': Token.objects.create(user=viewer).key,
+            'email': viewer.email,
+            'logout_token': Token.objects.create(user=free_author).key,
+            'tag': tags[0].pk,
+            'tags': [tag.pk for tag in tags],
+            'ingredient': ingredients[0].pk,
+            'ingredients': [ingredient.pk for ingredient in ingredients],
+            'user': free_author.pk,
+            'recipe': free_recipe.pk,
+            'own_recipe': own_recipe.pk,
+        }
@@ -0,0 +1,140 @@
+"""Метрики запросов в формате Prometheus.
+
+Метрики хранятся в памяти процесса: при нескольких воркерах gunicorn
+каждый отдаёт свои значения, а суммирует их Prometheus. Страница метрик
+доступна только напрямую из сетей METRICS_ALLOWED_NETWORKS: запросы через
+прокси (с заголовками X-Forwarded-*) отклоняются.
+"""
+import ipaddress
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+
+from .cache import feed_cache
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PREFIX = 'foodgram_'
+COUNTERS = {
+    'requests_total': 'Число запросов.',
+    'db_queries_total': 'Число SQL-запросов.',
+    'db_duplicate_queries_total': 'Число повторных SQL-запросов.',
+    'db_duration_seconds_total': 'Время выполнения SQL-запросов.',
+    'serialize_duration_seconds_total': 'Время сериализации объектов.',
+    'render_duration_seconds_total': 'Время кодирования ответов в JSON.',
+    'response_bytes_total': 'Размер ответов в байтах.',
+}
+HISTOGRAM = 'request_duration_seconds'
+PROXY_HEADERS = (
+    'HTTP_FORWARDED', 'HTTP_X_FORWARDED_FOR', 'HTTP_X_FORWARDED_HOST',
+    'HTTP_X_REAL_IP',
+)
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = defaultdict(float)
+        self.buckets = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+        self.sums = defaultdict(float)
+
+    def observe(self, stats, status):
+        view = (('view', stats.view), ('method', stats.method))
+        with self.lock:
+            counters = self.counters
+            counters['requests_total', view + (('status', status),)] += 1
+            counters['db_queries_total', view] += stats.queries
+            counters['db_duplicate_queries_total', view] += stats.duplicates
+            counters['db_duration_seconds_total', view] += stats.db_time
+            counters['serialize_duration_seconds_total', view] += (
+                stats.serialize_time
+            )
+            counters['render_duration_seconds_total', view] += (
+                stats.render_time
+            )
+            counters['response_bytes_total', view] += stats.response_size
+            self.buckets[view][bisect_left(BUCKETS, stats.duration)] += 1
+            self.sums[view] += stats.duration
+
+    def render(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            buckets = sorted(self.buckets.items())
+            sums = dict(self.sums)
+        for name, description in COUNTERS.items():
+            lines.append(f'# HELP {PREFIX}{name} {description}')
+            lines.append(f'# TYPE {PREFIX}{name} counter')
+            lines.extend(
+                f'{PREFIX}{name}{{{labels(label_set)}}} {value:g}'
+                for (metric, label_set), value in counters
+                if metric == name
+            )
+        name = PREFIX + HISTOGRAM
+        lines.append(f'# HELP {name} Время обработки запроса.')
+        lines.append(f'# TYPE {name} histogram')
+        for label_set, counts in buckets:
+            total = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), counts):
+                total += count
+                bucket = label_set + (('le', str(bound)),)
+                lines.append(f'{name}_bucket{{{labels(bucket)}}} {total}')
+            lines.append(
+                f'{name}_sum{{{labels(label_set)}}} {sums[label_set]:g}'
+            )
+            lines.append(f'{name}_count{{{labels(label_set)}}} {total}')
+        return '\n'.join(lines) + '\n'
+
+
+def labels(label_set):
+    return ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in label_set
+    )
+
+
+registry = Registry()
+
+
+def is_internal(request):
+    """Запрос пришёл напрямую из разрешённой сети, а не через прокси."""
+    if any(header in request.META for header in PROXY_HEADERS):
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
+
+
+def feed_cache_metrics():
+    """Попадания, промахи и сбросы кэша ленты (api/cache.py)."""
+    name = f'{PREFIX}feed_cache_events_total'
+    lines = [
+        f'# HELP {name} События кэша ленты рецептов.',
+        f'# TYPE {name} counter',
+    ]
+    stats = feed_cache.snapshot()
+    lines.extend(
+        f'{name}{{{labels((("event", event),))}}} {stats.get(event, 0)}'
+        for event in ('hits', 'misses', 'invalidations')
+    )
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    if not is_internal(request):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.render() + feed_cache_metrics(),
+        content_type='text/plain; version=0.0.4'
+    )
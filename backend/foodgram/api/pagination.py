@@ -1,6 +1,151 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import partial
+from hashlib import sha1
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes import versions
+from recipes.paginators import CountingPaginator
+from .conditional import user_resource
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+
+class CachedCountPagination(CustomPageNumberPagination):
+    """CustomPageNumberPagination с дешёвым подсчётом объектов.
+
+    Число объектов кэшируется на PAGINATION_COUNT_CACHE_TIMEOUT секунд
+    по пути, пользователю, параметрам фильтрации и версиям ресурсов:
+    count_resources представления и связей пользователя запроса, так что
+    после изменения рецептов или избранного число пересчитывается. Выше
+    PAGINATION_COUNT_ESTIMATE_THRESHOLD используется оценка планировщика
+    PostgreSQL. С параметром count=false подсчёт не выполняется, count
+    в ответе равен null, а page=last отклоняется: номер последней страницы
+    без подсчёта неизвестен.
+    """
+    count_query_param = 'count'
+    count_key_ignored_params = ('page', 'limit', 'count', 'cursor')
+    last_page_without_count_message = (
+        'Последняя страница недоступна при count=false.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        skip_count = (
+            request.query_params.get(self.count_query_param, '').lower()
+            in ('false', '0')
+        )
+        self.django_paginator_class = partial(
+            CountingPaginator,
+            count_key=self.get_count_key(request, view),
+            count_timeout=getattr(
+                settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 30
+            ),
+            estimate_threshold=getattr(
+                settings, 'PAGINATION_COUNT_ESTIMATE_THRESHOLD', None
+            ),
+            skip_count=skip_count,
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_number(self, request, paginator):
+        page_number = request.query_params.get(self.page_query_param, 1)
+        if paginator.skip_count and page_number in self.last_page_strings:
+            raise NotFound(self.last_page_without_count_message)
+        return super().get_page_number(request, paginator)
+
+    def get_count_key(self, request, view=None):
+        resources = list(getattr(view, 'count_resources', ()))
+        if request.user.is_authenticated:
+            resources.append(user_resource(request.user.pk))
+        stamps = versions.get_many(resources)
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            if name not in self.count_key_ignored_params
+            for value in values
+        )
+        raw = '|'.join((
+            request.path,
+            str(request.user.pk if request.user.is_authenticated else ''),
+            '&'.join(f'{name}={value}' for name, value in params),
+            ','.join(stamps[resource][0] for resource in resources),
+        ))
+        return f'api:count:{sha1(raw.encode()).hexdigest()}'
+
+
+class RecipePagination(CachedCountPagination):
+    """Пагинация ленты рецептов.
+
+    По умолчанию работает как CustomPageNumberPagination. Если в запросе
+    есть параметр cursor (для первой страницы — пустой), лента отдаётся
+    по ключу (pub_date, id) без COUNT и OFFSET: ответ содержит только
+    next и results.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-pub_date', '-id')
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            pub_date, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+            )
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(last.pub_date, last.id)
+        )
+
+    @staticmethod
+    def encode_cursor(pub_date, pk):
+        position = f'{pub_date.isoformat()}|{pk}'.encode()
+        return urlsafe_b64encode(position).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
@@ -0,0 +1,99 @@
+"""Связи пользователя: подписки, избранное и корзина.
+
+Флаги is_subscribed, is_favorited и is_in_shopping_cart отмечаются
+проверкой вхождения id в множества, а не подзапросами Exists, поэтому
+запрос рецептов не зависит от пользователя, а готовую ленту можно
+кэшировать общей для всех. Множества загружаются одним запросом и
+кэшируются под версией связей пользователя (user_resource). Версия
+хранится в базе (recipes/versions.py) и меняется сигналами api/signals.py
+при подписке и изменении избранного или корзины, поэтому новые связи
+сразу видят все воркеры, даже если у каждого свой кэш в памяти.
+В пределах запроса загруженные связи запоминаются на объекте запроса.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import IntegerField, Value
+
+from recipes import versions
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+from .conditional import user_resource
+
+FOLLOWED, FAVORITES, CART = range(3)
+KEY = 'api:relations:{}:{}'
+
+
+class Relations:
+
+    def __init__(self, followed=(), favorites=(), cart=()):
+        self.followed = frozenset(followed)
+        self.favorites = frozenset(favorites)
+        self.cart = frozenset(cart)
+
+    def dump(self):
+        """Компактное представление для кэша: отсортированные списки id."""
+        return tuple(
+            sorted(ids) for ids in (self.followed, self.favorites, self.cart)
+        )
+
+
+EMPTY = Relations()
+
+
+def load(user):
+    rows = (
+        Follow.objects.filter(user=user).order_by().annotate(
+            kind=Value(FOLLOWED, output_field=IntegerField())
+        ).values_list('kind', 'author_id').union(
+            Favorite.objects.filter(user=user).order_by().annotate(
+                kind=Value(FAVORITES, output_field=IntegerField())
+            ).values_list('kind', 'recipe_id'),
+            ShoppingCart.objects.filter(user=user).order_by().annotate(
+                kind=Value(CART, output_field=IntegerField())
+            ).values_list('kind', 'recipe_id'),
+            all=True,
+        )
+    )
+    ids = ([], [], [])
+    for kind, pk in rows:
+        ids[kind].append(pk)
+    return Relations(*ids)
+
+
+def get_relations(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return EMPTY
+    relations = getattr(request, 'relations', None)
+    if relations is not None:
+        return relations
+    key = KEY.format(user.pk, versions.get(user_resource(user.pk))[0])
+    data = cache.get(key)
+    if data is None:
+        relations = load(user)
+        cache.set(
+            key, relations.dump(),
+            getattr(settings, 'RELATIONS_CACHE_TIMEOUT', 300)
+        )
+    else:
+        relations = Relations(*data)
+    request.relations = relations
+    return relations
+
+
+def from_context(context):
+    """Связи из контекста сериализатора или пользователя запроса."""
+    if context.get('relations') is not None:
+        return context['relations']
+    return get_relations(context.get('request'))
+
+
+def mark_recipes(recipes, relations):
+    """Проставляет флаги в уже сериализованных рецептах."""
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in relations.favorites
+        recipe['is_in_shopping_cart'] = recipe['id'] in relations.cart
+        author = recipe['author']
+        if author:
+            author['is_subscribed'] = author['id'] in relations.followed
+    return recipes
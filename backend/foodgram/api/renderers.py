@@ -0,0 +1,18 @@
+import time
+
+from rest_framework import renderers
+
+from .instrumentation import current
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """JSON-рендерер, учитывающий время кодирования ответа."""
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            stats = current.get()
+            if stats is not None:
+                stats.render_time += time.perf_counter() - started
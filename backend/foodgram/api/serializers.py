@@ -1,12 +1,18 @@
-from django.db.models import F
+import json
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import QueryDict
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from recipes import images
 from recipes.models import (Ingredient, IngredientsAmount, Recipe,
-                            Tag, ShoppingCart, Favorite)
+                            Tag, ShoppingCart, ShoppingListItem, Favorite)
 from users.models import Follow, User
+from .fields import StreamingBase64ImageField
+from .relations import from_context
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -34,6 +40,42 @@ class IngredientsAmountSerializer(serializers.ModelSerializer):
         fields = ('ingredient', 'recipe', 'amount')
 
 
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные копии картинки рецепта.
+
+    Пока копии не собраны, во всех вариантах отдаётся исходная картинка.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def url(self, path):
+        url = default_storage.url(path)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        if images.is_stale(recipe):
+            original = self.url(recipe.image.name)
+            return {
+                name: {file_format: original for file_format in images.FORMATS}
+                for name in images.VARIANTS
+            }
+        return {
+            name: {
+                file_format: self.url(path)
+                for file_format, path in recipe.image_variants[name].items()
+            }
+            for name in images.VARIANTS
+        }
+
+
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
@@ -49,12 +91,7 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Follow.objects.filter(
-            user=request.user, author=obj).exists()
+        return obj.pk in from_context(self.context).followed
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -71,29 +108,50 @@ class RecipeSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
-    is_favorited = serializers.BooleanField(read_only=True)
-    is_in_shopping_cart = serializers.BooleanField(read_only=True)
-    image = Base64ImageField()
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+    image = StreamingBase64ImageField()
+    images = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time'
+            'name', 'image', 'images', 'text', 'cooking_time'
         )
 
     def get_ingredients(self, obj):
-        return obj.ingredients.values(
-            'id', 'name', 'measurement_unit', amount=F('ingredient__amount')
-        )
+        ingredient_amounts = obj.recipe.all()
+        if 'recipe' not in getattr(obj, '_prefetched_objects_cache', {}):
+            ingredient_amounts = ingredient_amounts.select_related(
+                'ingredient'
+            )
+        return [
+            {
+                'id': ingredient_amount.ingredient.id,
+                'name': ingredient_amount.ingredient.name,
+                'measurement_unit': (
+                    ingredient_amount.ingredient.measurement_unit
+                ),
+                'amount': ingredient_amount.amount,
+            } for ingredient_amount in ingredient_amounts
+        ]
+
+    def get_is_favorited(self, obj):
+        return obj.pk in from_context(self.context).favorites
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.pk in from_context(self.context).cart
 
     def create_ingredients(self, recipe, ingredients):
+        if not ingredients:
+            return recipe
         IngredientsAmount.objects.bulk_create([
             IngredientsAmount(
                 recipe=recipe,
                 amount=ingredient['amount'],
-                ingredient=Ingredient.objects.get(id=ingredient['id']),
+                ingredient_id=ingredient['id'],
             ) for ingredient in ingredients
         ])
         return recipe
@@ -105,45 +163,55 @@ class RecipeSerializer(serializers.ModelSerializer):
             )
         ingredient_list = []
         for ingredient in ingredients:
-            id = ingredient.get('id')
-            amount = ingredient.get('amount')
-            if int(amount) is None:
+            try:
+                id = int(ingredient.get('id'))
+            except (TypeError, ValueError):
                 raise serializers.ValidationError(
-                    'Укажите количество ингредиентов.'
+                    'Такого ингредиента нет в БД.'
                 )
-            if int(amount) < 1:
+            try:
+                amount = int(ingredient.get('amount'))
+            except (TypeError, ValueError):
                 raise serializers.ValidationError(
-                    'Количество ингридиентов не может быть меньше 1.'
+                    'Укажите количество ингредиентов.'
                 )
-            if not Ingredient.objects.filter(id=id).exists():
+            if amount < 1:
                 raise serializers.ValidationError(
-                    'Такого ингредиента нет в БД.'
+                    'Количество ингридиентов не может быть меньше 1.'
                 )
-            if id in ingredient_list:
+            if id in (item['id'] for item in ingredient_list):
                 raise serializers.ValidationError(
                     'Нельзя добавлять одинаковые ингридиенты.'
                 )
-            ingredient_list.append(id)
-        return ingredients
+            ingredient_list.append({'id': id, 'amount': amount})
+        ids = [item['id'] for item in ingredient_list]
+        if len(ids) != Ingredient.objects.filter(id__in=ids).count():
+            raise serializers.ValidationError(
+                'Такого ингредиента нет в БД.'
+            )
+        return ingredient_list
 
     def validate_tags(self, tags):
         if not tags:
             raise serializers.ValidationError(
                 'Поле tags не может быть пустым'
             )
-        tag_list = []
-        for tag in tags:
-            id = tag.get('id')
-            if not Tag.objects.filter(id=tag).exists():
-                raise serializers.ValidationError(
-                    f'Тега {tag} не существует'
-                )
-            if id in tag_list:
-                raise serializers.ValidationError(
-                    'Теги дублируются'
-                )
-            tag_list.append(id)
-        return tags
+        try:
+            tag_list = [int(tag) for tag in tags]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError('Теги должны быть id.')
+        if len(set(tag_list)) != len(tag_list):
+            raise serializers.ValidationError(
+                'Теги дублируются'
+            )
+        missing = set(tag_list) - set(
+            Tag.objects.filter(id__in=tag_list).values_list('id', flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                f'Тега {", ".join(map(str, sorted(missing)))} не существует'
+            )
+        return tag_list
 
     def validate_cooking_time(self, cooking_time):
         if cooking_time <= 0:
@@ -152,25 +220,115 @@ class RecipeSerializer(serializers.ModelSerializer):
             )
         return cooking_time
 
+    def get_initial(self, field):
+        """Сырое значение поля; в multipart-форме ingredients — JSON."""
+        if not isinstance(self.initial_data, QueryDict):
+            return self.initial_data.get(field)
+        if field == 'tags':
+            return self.initial_data.getlist(field)
+        try:
+            value = json.loads(self.initial_data.get(field, ''))
+        except ValueError:
+            return None
+        if not isinstance(value, list) or not all(
+            isinstance(item, dict) for item in value
+        ):
+            return None
+        return value
+
+    def validate(self, data):
+        for field, validator in (
+            ('ingredients', self.validate_ingredients),
+            ('tags', self.validate_tags),
+        ):
+            try:
+                data[field] = validator(self.get_initial(field))
+            except serializers.ValidationError as error:
+                raise serializers.ValidationError({field: error.detail})
+        return data
+
+    def save(self, **kwargs):
+        # Хранилище переносит временный файл картинки на место, поэтому
+        # закрываем его явно, а не при сборке мусора.
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
+    @transaction.atomic
     def create(self, validated_data):
+        ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(self.initial_data.get('tags'))
-        ingredients = self.validated_data.get('ingredients')
+        recipe.tags.add(*tags)
         return self.create_ingredients(recipe, ingredients)
 
+    def update_ingredients(self, recipe, ingredients):
+        """Применяет к составу рецепта только изменившиеся строки."""
+        existing = {
+            ingredient_amount.ingredient_id: ingredient_amount
+            for ingredient_amount in IngredientsAmount.objects.filter(
+                recipe=recipe
+            )
+        }
+        old_amounts = {
+            ingredient_id: ingredient_amount.amount
+            for ingredient_id, ingredient_amount in existing.items()
+        }
+        new_amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        to_update = []
+        for ingredient_id, amount in new_amounts.items():
+            ingredient_amount = existing.get(ingredient_id)
+            if ingredient_amount and ingredient_amount.amount != amount:
+                ingredient_amount.amount = amount
+                to_update.append(ingredient_amount)
+        to_delete = [
+            ingredient_amount.pk
+            for ingredient_id, ingredient_amount in existing.items()
+            if ingredient_id not in new_amounts
+        ]
+        if to_delete:
+            IngredientsAmount.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            IngredientsAmount.objects.bulk_update(to_update, ['amount'])
+        self.create_ingredients(recipe, [
+            ingredient for ingredient in ingredients
+            if ingredient['id'] not in existing
+        ])
+        ShoppingListItem.update_recipe(recipe, old_amounts, new_amounts)
+        return recipe
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.ingredients.clear()
-        instance.tags.clear()
-        ingredients = self.validated_data.get('ingredients')
-        instance.tags.set(self.initial_data.get('tags'))
-        instance = self.create_ingredients(instance, ingredients)
+        ingredients = validated_data.pop('ingredients')
+        instance.tags.set(validated_data.pop('tags'))
+        instance = self.update_ingredients(instance, ingredients)
         return super().update(instance, validated_data)
 
 
 class RecipeShortInfo(serializers.ModelSerializer):
+    images = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса или None, если оно не задано."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    if not recipes_limit.isdigit():
+        raise serializers.ValidationError({
+            'errors': 'recipes_limit должен быть неотрицательным целым числом.'
+        })
+    return int(recipes_limit)
 
 
 class FollowListSerializer(serializers.ModelSerializer):
@@ -190,20 +348,25 @@ class FollowListSerializer(serializers.ModelSerializer):
 
     def get_recipes(self, author):
         queryset = self.context.get('request')
-        recipes_limit = queryset.query_params.get('recipes_limit')
-        if not recipes_limit:
+        if hasattr(author, 'limited_recipes'):
+            return RecipeShortInfo(
+                author.limited_recipes,
+                many=True, context={'request': queryset}
+            ).data
+        recipes_limit = get_recipes_limit(queryset)
+        if recipes_limit is None:
             return RecipeShortInfo(
                 Recipe.objects.filter(author=author),
                 many=True, context={'request': queryset}
             ).data
         return RecipeShortInfo(
-            Recipe.objects.filter(author=author)[:int(recipes_limit)],
+            Recipe.objects.filter(author=author)[:recipes_limit],
             many=True,
             context={'request': queryset}
         ).data
 
     def get_recipes_count(self, author):
-        return Recipe.objects.filter(author=author).count()
+        return author.recipes_count
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -224,6 +387,7 @@ class FollowSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({
                 'errors': 'Вы уже подписаны на этого пользователя.'
             })
+        return data
 
     def to_representation(self, value):
         return FollowListSerializer(
@@ -248,6 +412,11 @@ class CartSerializer(serializers.ModelSerializer):
             })
         return data
 
+    @transaction.atomic
+    def create(self, validated_data):
+        """Список покупок дополняется сигналом в той же транзакции."""
+        return super().create(validated_data)
+
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from recipes import versions
+from recipes.models import (Favorite, Ingredient, IngredientsAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+from . import instrumentation
+from .authentication import token_cache
+from .cache import feed_cache
+from .conditional import user_resource
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=IngredientsAmount)
+@receiver(post_delete, sender=IngredientsAmount)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_feed_cache(**kwargs):
+    versions.on_commit_once(feed_cache.invalidate)
+
+
+@receiver(post_save, sender=User)
+def invalidate_feed_cache_on_author_change(update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    versions.on_commit_once(feed_cache.invalidate)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_user_relations_version(instance, **kwargs):
+    versions.bump_on_commit(user_resource(instance.user_id))
+
+
+@receiver(connection_created)
+def instrument_connection(connection, **kwargs):
+    instrumentation.install(connection)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(instance, **kwargs):
+    # После удаления Collector обнуляет pk (key) экземпляра, поэтому ключ
+    # запоминается до коммита.
+    key = instance.key
+    transaction.on_commit(lambda: token_cache.invalidate(key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
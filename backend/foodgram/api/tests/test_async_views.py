@@ -0,0 +1,107 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api import async_views
+from recipes import catalog, versions
+from recipes.models import Ingredient, Tag
+from users.models import User
+
+
+@override_settings(ASYNC_VIEWS_WORKERS=0)
+class AsyncViewsTest(TestCase):
+    """Асинхронные представления отвечают так же, как синхронные."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag_{number}'
+            ) for number in range(3)
+        ]
+        for name in ('Сахар', 'Сахарная пудра', 'Соль', 'Масло сливочное'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        cls.ingredient = Ingredient.objects.get(name='Соль')
+        cls.user = User.objects.create(
+            username='viewer', email='viewer@example.com'
+        )
+        cls.token = Token.objects.create(user=cls.user).key
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def call(self, view, url, *args, **headers):
+        return async_to_sync(view)(self.factory.get(url, **headers), *args)
+
+    def assertSameResponse(self, view, url, *args):
+        expected = self.client.get(url)
+        response = self.call(view, url, *args)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(
+            json.loads(response.content), json.loads(expected.content)
+        )
+        if expected.status_code == 200:
+            self.assertEqual(response['ETag'], expected['ETag'])
+        return response
+
+    def test_tags(self):
+        self.assertSameResponse(async_views.tag_list, '/api/tags/')
+        tag = self.tags[1]
+        self.assertSameResponse(
+            async_views.tag_detail, f'/api/tags/{tag.pk}/', tag.pk
+        )
+        self.assertSameResponse(
+            async_views.tag_detail, '/api/tags/999999/', 999999
+        )
+
+    def test_ingredient_autocomplete(self):
+        for url in (
+            '/api/ingredients/',
+            '/api/ingredients/?name=сах',
+            '/api/ingredients/?name=сл&limit=1',
+            '/api/ingredients/?name=нет',
+        ):
+            with self.subTest(url=url):
+                self.assertSameResponse(async_views.ingredient_list, url)
+        pk = self.ingredient.pk
+        self.assertSameResponse(
+            async_views.ingredient_detail, f'/api/ingredients/{pk}/', pk
+        )
+
+    def test_not_modified(self):
+        etag = self.call(async_views.tag_list, '/api/tags/')['ETag']
+        response = self.call(
+            async_views.tag_list, '/api/tags/', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_snapshots_follow_versions(self):
+        self.call(async_views.tag_list, '/api/tags/')
+        Tag.objects.create(name='Новый', color='#123456', slug='new')
+        Ingredient.objects.create(
+            name='Сахар ванильный', measurement_unit='г'
+        )
+        # Сигналы меняют версии после коммита, которого в TestCase нет.
+        versions.bump('tags')
+        catalog.invalidate()
+        self.assertSameResponse(async_views.tag_list, '/api/tags/')
+        self.assertSameResponse(
+            async_views.ingredient_list, '/api/ingredients/?name=сах'
+        )
+
+    def test_token_is_checked(self):
+        response = self.call(
+            async_views.tag_list, '/api/tags/',
+            HTTP_AUTHORIZATION='Token invalid'
+        )
+        self.assertEqual(response.status_code, 401)
+        response = self.call(
+            async_views.tag_list, '/api/tags/',
+            HTTP_AUTHORIZATION=f'Token {self.token}'
+        )
+        self.assertEqual(response.status_code, 200)
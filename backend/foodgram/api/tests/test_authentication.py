@@ -0,0 +1,55 @@
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import TokenCache, make_snapshot, token_cache
+from users.models import User
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """Кэшированный токен перестаёт действовать после выхода и
+    деактивации пользователя."""
+
+    def setUp(self):
+        token_cache.local.data.clear()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='secret'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Первый запрос кладёт пользователя в кэш.
+        self.assertEqual(self.me().status_code, 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+    def me(self):
+        return self.client.get('/api/users/me/')
+
+    def test_logout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_deactivation(self):
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_user_deletion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_shared_cache_is_not_copied_locally(self):
+        caches['default'].clear()
+        workers = [
+            TokenCache(size=10, timeout=60, alias='default')
+            for _ in range(2)
+        ]
+        workers[0].set(self.token.key, make_snapshot(self.token))
+        self.assertIsNotNone(workers[1].get(self.token.key))
+        workers[0].invalidate(self.token.key)
+        self.assertIsNone(workers[1].get(self.token.key))
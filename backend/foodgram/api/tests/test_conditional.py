@@ -0,0 +1,87 @@
+from recipes.models import Favorite, Recipe, Tag
+from users.models import User
+from .test_queries import QueryCountTestCase
+
+
+class ConditionalGetTest(QueryCountTestCase):
+    """ETag и Last-Modified у чтений и их смена после записи."""
+
+    def setUp(self):
+        super().setUp()
+        with self.committed():
+            self.create_authors(1)
+            self.create_recipes(3)
+
+    def test_not_modified(self):
+        for url in (
+            '/api/tags/', f'/api/tags/{self.tags[0].id}/',
+            '/api/ingredients/?name=ингр', '/api/recipes/',
+            f'/api/recipes/{Recipe.objects.first().id}/',
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Last-Modified', response)
+                cached = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.content, b'')
+                self.assertEqual(cached['ETag'], response['ETag'])
+                cached = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(cached.status_code, 304)
+
+    def test_etag_depends_on_query(self):
+        self.assertNotEqual(
+            self.client.get('/api/recipes/?limit=1')['ETag'],
+            self.client.get('/api/recipes/?limit=2')['ETag'],
+        )
+
+    def test_tag_write_changes_etag(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        with self.committed():
+            Tag.objects.create(name='Новый', color='#123456', slug='new')
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), len(self.tags) + 1)
+
+    def test_recipe_write_changes_etag(self):
+        recipe = Recipe.objects.first()
+        url = f'/api/recipes/{recipe.id}/'
+        etag = self.client.get(url)['ETag']
+        with self.committed():
+            recipe.name = 'Новое название'
+            recipe.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Новое название')
+
+    def test_recipe_etag_is_per_user(self):
+        url = '/api/recipes/'
+        response = self.client.get(url)
+        self.assertIn('Authorization', response['Vary'])
+        other = User.objects.create(
+            username='other', email='other@example.com'
+        )
+        self.client.force_authenticate(other)
+        self.assertNotEqual(self.client.get(url)['ETag'], response['ETag'])
+
+    def test_favorite_changes_only_own_etag(self):
+        other = User.objects.create(
+            username='other', email='other@example.com'
+        )
+        url = '/api/recipes/'
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(other)
+        other_etag = self.client.get(url)['ETag']
+        recipe = Recipe.objects.exclude(favoritting__user=other).first()
+        with self.committed():
+            Favorite.objects.create(user=other, recipe=recipe)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=other_etag)
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(self.viewer)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
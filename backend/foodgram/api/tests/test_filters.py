@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.test import override_settings
+
+from recipes.models import Recipe, Tag
+from .test_pagination import LOCMEM_CACHE
+from .test_queries import QueryCountTestCase
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TagFilterTest(QueryCountTestCase):
+    """Фильтр ленты по slug тегов."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_authors(1)
+        self.create_recipes(6)
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_ids(self, query):
+        response = self.client.get(f'/api/recipes/?limit=100&{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(response.data['results']))
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def expected_ids(self, slugs):
+        return set(
+            Recipe.objects.filter(tags__slug__in=slugs)
+            .values_list('id', flat=True)
+        )
+
+    def test_several_tags_without_duplicates(self):
+        for slugs in (['tag_1'], ['tag_0', 'tag_1'], ['tag_1', 'tag_2']):
+            with self.subTest(slugs=slugs):
+                ids = self.get_ids('&'.join(f'tags={slug}' for slug in slugs))
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(set(ids), self.expected_ids(slugs))
+
+    def test_unknown_slugs(self):
+        self.assertEqual(self.get_ids('tags=unknown&tags=missing'), [])
+        self.assertEqual(
+            self.get_ids('tags=unknown&tags=tag_2'),
+            self.get_ids('tags=tag_2'),
+        )
+
+    def test_new_tag_is_found(self):
+        self.assertEqual(self.get_ids('tags=new'), [])
+        with self.committed():
+            tag = Tag.objects.create(name='Новый', color='#123456', slug='new')
+            Recipe.objects.first().tags.add(tag)
+        self.assertEqual(len(self.get_ids('tags=new')), 1)
@@ -0,0 +1,184 @@
+import base64
+import io
+import json
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+from PIL import Image
+from rest_framework import serializers
+
+from api.fields import StreamingBase64ImageField
+from recipes import images
+from recipes.models import IngredientsAmount, Recipe
+from .test_queries import QueryCountTestCase
+
+
+def image_bytes(color, size=(32, 32), image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def data_uri(color, size=(32, 32)):
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(image_bytes(color, size)).decode()
+    )
+
+
+class ImageFieldLimitsTest(SimpleTestCase):
+    """Ограничения размера картинки в base64 и в multipart-форме."""
+
+    def assertFails(self, field, data, code):
+        with self.assertRaises(serializers.ValidationError) as context:
+            field.to_internal_value(data)
+        self.assertEqual(context.exception.get_codes(), [code])
+
+    def upload(self, content):
+        return SimpleUploadedFile('image.png', content, 'image/png')
+
+    def test_too_large(self):
+        content = image_bytes('red')
+        field = StreamingBase64ImageField(max_size=len(content) - 1)
+        self.assertFails(field, data_uri('red'), 'too_large')
+        self.assertFails(field, self.upload(content), 'too_large')
+
+    def test_too_many_pixels(self):
+        field = StreamingBase64ImageField(max_pixels=32 * 32 - 1)
+        self.assertFails(field, data_uri('red'), 'too_many_pixels')
+        self.assertFails(
+            field, self.upload(image_bytes('red')), 'too_many_pixels'
+        )
+        # Размеры проверяются по заголовку, до декодирования всех данных.
+        self.assertFails(
+            field, data_uri('red', size=(2000, 2000)), 'too_many_pixels'
+        )
+
+    def test_within_limits(self):
+        content = image_bytes('red')
+        field = StreamingBase64ImageField(
+            max_size=len(content), max_pixels=32 * 32
+        )
+        for data in (data_uri('red'), self.upload(content)):
+            with self.subTest(data=type(data).__name__):
+                file = field.to_internal_value(data)
+                self.assertTrue(file.name.endswith('.png'))
+                file.close()
+
+    def test_bad_format(self):
+        field = StreamingBase64ImageField()
+        content = image_bytes('red', image_format='BMP')
+        self.assertFails(field, self.upload(content), 'bad_format')
+        self.assertFails(
+            field, 'data:image/bmp;base64,' + base64.b64encode(
+                content
+            ).decode(), 'bad_format'
+        )
+
+
+class MultipartRecipeTest(QueryCountTestCase):
+    """Рецепт можно отправить multipart-формой с файлом картинки."""
+
+    def post(self, ingredients):
+        with self.committed():
+            return self.client.post('/api/recipes/', {
+                'name': 'Рецепт из формы',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'tags': [self.tags[0].id, self.tags[2].id],
+                'ingredients': ingredients,
+                'image': SimpleUploadedFile(
+                    'photo.png', image_bytes('green'), 'image/png'
+                ),
+            }, format='multipart')
+
+    def test_create(self):
+        response = self.post(json.dumps([
+            {'id': self.ingredients[0].id, 'amount': 5},
+            {'id': self.ingredients[1].id, 'amount': 7},
+        ]))
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertEqual(
+            set(recipe.tags.values_list('id', flat=True)),
+            {self.tags[0].id, self.tags[2].id}
+        )
+        self.assertEqual(
+            set(IngredientsAmount.objects.filter(recipe=recipe).values_list(
+                'ingredient_id', 'amount'
+            )),
+            {(self.ingredients[0].id, 5), (self.ingredients[1].id, 7)}
+        )
+        self.assertTrue(recipe.image.name.endswith('.png'))
+        self.assertTrue(default_storage.exists(recipe.image.name))
+
+    def test_bad_ingredients_json(self):
+        for ingredients in ('not json', json.dumps({'id': 1})):
+            with self.subTest(ingredients=ingredients):
+                response = self.post(ingredients)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ingredients', response.data)
+
+
+class ImageVariantFilesTest(QueryCountTestCase):
+    """Файлы вариантов удаляются, когда на них больше нет ссылок."""
+
+    def create_recipe(self, color):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', {
+                'name': f'Рецепт {color}',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'tags': [self.tags[0].id],
+                'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+                'image': data_uri(color),
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Recipe.objects.get(pk=response.data['id'])
+
+    def variant_files(self, recipe):
+        recipe.refresh_from_db()
+        paths = images.variant_paths(recipe.image_variants)
+        self.assertEqual(len(paths), len(images.VARIANTS) * 2)
+        return paths
+
+    def assertFilesExist(self, paths, exist=True):
+        for path in paths:
+            self.assertEqual(default_storage.exists(path), exist, path)
+
+    def test_replaced_image_variants_are_deleted(self):
+        recipe = self.create_recipe('red')
+        old = self.variant_files(recipe)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.id}/', {
+                    'tags': [self.tags[0].id],
+                    'ingredients': [
+                        {'id': self.ingredients[0].id, 'amount': 1}
+                    ],
+                    'image': data_uri('blue'),
+                }, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        new = self.variant_files(recipe)
+        self.assertFalse(old & new)
+        self.assertFilesExist(old, exist=False)
+        self.assertFilesExist(new)
+
+    def test_deleted_recipe_variants_are_deleted(self):
+        recipe = self.create_recipe('green')
+        paths = self.variant_files(recipe)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFilesExist(paths, exist=False)
+
+    def test_shared_variants_are_kept(self):
+        first = self.create_recipe('white')
+        second = self.create_recipe('white')
+        paths = self.variant_files(first)
+        self.assertEqual(paths, self.variant_files(second))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/recipes/{first.id}/')
+        self.assertFilesExist(paths)
@@ -0,0 +1,103 @@
+import re
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientsAmount, Recipe, Tag
+from users.models import User
+
+
+def server_timing(response):
+    return dict(re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing']))
+
+
+class ServerTimingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        tag = Tag.objects.create(name='Завтрак', color='#00ff00', slug='br')
+        ingredient = Ingredient.objects.create(
+            name='Овсянка', measurement_unit='г'
+        )
+        for number in range(6):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                image='recipe_images/test.jpg', text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.set([tag])
+            IngredientsAmount.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=50
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_disabled_by_default(self):
+        response = self.client.get('/api/recipes/')
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_serialization_is_timed(self):
+        timing = server_timing(self.client.get('/api/recipes/'))
+        self.assertEqual(
+            set(timing), {'db', 'serialize', 'render', 'app', 'total'}
+        )
+        self.assertGreater(float(timing['serialize']), 0)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_directly_built_serializers_are_timed(self):
+        viewer = User.objects.create(
+            username='viewer', email='viewer@example.com'
+        )
+        self.client.force_authenticate(viewer)
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        timing = server_timing(self.client.get('/api/users/subscriptions/'))
+        self.assertGreater(float(timing['serialize']), 0)
+
+    def test_drf_serializers_are_not_patched(self):
+        self.client.get('/api/recipes/')
+        for serializer_class in (
+            serializers.Serializer, serializers.ListSerializer
+        ):
+            with self.subTest(serializer_class=serializer_class):
+                self.assertFalse(
+                    getattr(serializer_class.data.fget, 'timed', False)
+                )
+
+
+class MetricsAccessTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_internal_address(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            b'foodgram_serialize_duration_seconds_total', response.content
+        )
+
+    def test_feed_cache_events(self):
+        self.client.get('/api/recipes/')
+        response = self.client.get('/metrics')
+        self.assertRegex(
+            response.content.decode(),
+            r'foodgram_feed_cache_events_total\{event="misses"\} [1-9]'
+        )
+
+    def test_external_or_proxied_requests_are_rejected(self):
+        for headers in (
+            {'REMOTE_ADDR': '203.0.113.5'},
+            {'HTTP_X_FORWARDED_FOR': '203.0.113.5'},
+            {'HTTP_X_FORWARDED_HOST': 'foodgram.example.org'},
+        ):
+            with self.subTest(headers=headers):
+                response = self.client.get('/metrics', **headers)
+                self.assertEqual(response.status_code, 403)
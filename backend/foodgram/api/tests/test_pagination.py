@@ -0,0 +1,150 @@
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe
+from .test_queries import QueryCountTestCase
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pagination-tests',
+    }
+}
+
+
+class NoCountPaginationTest(QueryCountTestCase):
+    """Постраничный вывод с count=false и без него."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_authors(1)
+        self.create_recipes(5)
+
+    def test_count_is_numeric_by_default(self):
+        response = self.client.get('/api/recipes/?limit=2&page=last')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_page_without_count(self):
+        response = self.client.get('/api/recipes/?limit=2&page=2&count=false')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('page=3', response.data['next'])
+        self.assertNotIn('page=', response.data['previous'])
+
+    def test_last_page_without_count(self):
+        response = self.client.get('/api/recipes/?limit=2&page=3&count=false')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_page_last_rejected_without_count(self):
+        for url in (
+            '/api/recipes/?limit=2&page=last&count=false',
+            '/api/recipes/?limit=2&page=4&count=false',
+            '/api/users/?page=last&count=false',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CursorPaginationTest(QueryCountTestCase):
+    """Лента по курсору: порядок (pub_date, id), без повторов и COUNT."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_authors(2)
+        self.create_recipes(7)
+        # Несколько рецептов с одинаковой датой: порядок внутри — по id.
+        now = timezone.now()
+        recipes = list(Recipe.objects.order_by('id'))
+        for number, recipe in enumerate(recipes):
+            Recipe.objects.filter(id=recipe.id).update(
+                pub_date=now - timedelta(minutes=number // 3)
+            )
+        self.expected = list(
+            Recipe.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def test_follows_next_links(self):
+        url = '/api/recipes/?cursor=&limit=2'
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.data), ['next', 'results'])
+            self.assertLessEqual(len(response.data['results']), 2)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, self.expected)
+
+    def test_keeps_filters(self):
+        response = self.client.get(
+            '/api/recipes/?cursor=&limit=1&is_favorited=1'
+        )
+        self.assertIn('is_favorited=1', response.data['next'])
+        ids = [recipe['id'] for recipe in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(
+            ids, [
+                pk for pk in self.expected
+                if Favorite.objects.filter(
+                    user=self.viewer, recipe_id=pk
+                ).exists()
+            ][:2]
+        )
+
+    def test_malformed_cursor(self):
+        for cursor in (
+            'garbage',
+            urlsafe_b64encode(b'nodate|1').decode(),
+            urlsafe_b64encode(b'2022-01-01T00:00:00|id').decode(),
+            urlsafe_b64encode(b'\xff\xfe').decode(),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f'/api/recipes/?cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Неверный курсор.')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CachedCountInvalidationTest(QueryCountTestCase):
+    """Закэшированное число объектов сбрасывается после изменений."""
+
+    def setUp(self):
+        super().setUp()
+        with self.committed():
+            self.create_authors(1)
+            self.create_recipes(5)
+
+    def tearDown(self):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def test_count_follows_favorites(self):
+        url = '/api/recipes/?is_favorited=1&limit=2'
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 2)
+        self.assertIsNone(response.data['next'])
+        recipe = Recipe.objects.exclude(favoritting__user=self.viewer).first()
+        with self.committed():
+            Favorite.objects.create(user=self.viewer, recipe=recipe)
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 3)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_count_follows_new_recipes(self):
+        url = '/api/recipes/?limit=5'
+        self.assertEqual(self.client.get(url).data['count'], 5)
+        with self.committed():
+            self.create_recipes(1)
+        self.assertEqual(self.client.get(url).data['count'], 6)
@@ -0,0 +1,189 @@
+import os
+import shutil
+import tempfile
+from base64 import b64decode
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientsAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+MEDIA_ROOT = tempfile.mkdtemp()
+# Картинка рецептов из create_recipes: она нужна сборке вариантов,
+# которая запускается после коммита (см. committed).
+RECIPE_IMAGE = 'recipe_images/test.jpg'
+GIF_BYTES = b64decode(
+    'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
+)
+
+
+@override_settings(
+    CACHES=NO_CACHE, MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANTS_WORKERS=0
+)
+class QueryCountTestCase(TestCase):
+    """Число запросов не должно зависеть от размера страницы.
+
+    Кэш отключён, чтобы каждый вызов шёл по пути без попаданий.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        path = os.path.join(settings.MEDIA_ROOT, RECIPE_IMAGE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(GIF_BYTES)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create(
+            username='viewer', email='viewer@example.com'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag_{number}'
+            ) for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            ) for number in range(10)
+        ]
+
+    def setUp(self):
+        self.authors = []
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def create_authors(self, count):
+        start = len(self.authors)
+        for number in range(start, start + count):
+            author = User.objects.create(
+                username=f'author_{number}',
+                email=f'author_{number}@example.com'
+            )
+            Follow.objects.create(user=self.viewer, author=author)
+            self.authors.append(author)
+
+    def create_recipes(self, count, author=None):
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=author or self.authors[number % len(self.authors)],
+                name=f'Рецепт {Recipe.objects.count()}',
+                image=RECIPE_IMAGE, text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.set(self.tags[:1 + number % len(self.tags)])
+            IngredientsAmount.objects.bulk_create(
+                IngredientsAmount(
+                    recipe=recipe,
+                    ingredient=self.ingredients[
+                        (number + shift) % len(self.ingredients)
+                    ],
+                    amount=shift + 1
+                ) for shift in range(3)
+            )
+            if number % 2:
+                Favorite.objects.create(user=self.viewer, recipe=recipe)
+            if number % 3:
+                ShoppingCart.objects.create(user=self.viewer, recipe=recipe)
+
+    def count_queries(self, url):
+        """Второй вызов: первый создаёт строки версий ресурсов."""
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    @contextmanager
+    def committed(self):
+        """Выполняет отложенные до коммита вызовы, как настоящий коммит.
+
+        TestCase не коммитит, а captureOnCommitCallbacks оставляет вызовы
+        в очереди транзакции теста; по ним versions.on_commit_once решил
+        бы, что сброс кэша уже запланирован. Поэтому очередь очищается
+        до и после блока.
+        """
+        connection.run_on_commit.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            yield
+        connection.run_on_commit.clear()
+
+
+class FeedQueryCountTest(QueryCountTestCase):
+
+    def test_recipe_list_queries_do_not_grow_with_page(self):
+        self.create_authors(2)
+        self.create_recipes(2)
+        small = self.count_queries('/api/recipes/?limit=2')
+        self.create_authors(5)
+        self.create_recipes(20)
+        large = self.count_queries('/api/recipes/?limit=22')
+        self.assertEqual(small, large)
+
+    def test_recipe_list_flags(self):
+        self.create_authors(1)
+        self.create_recipes(2)
+        response = self.client.get('/api/recipes/?limit=2')
+        recipes = {
+            recipe['name']: recipe for recipe in response.data['results']
+        }
+        self.assertFalse(recipes['Рецепт 0']['is_favorited'])
+        self.assertTrue(recipes['Рецепт 1']['is_favorited'])
+        self.assertTrue(recipes['Рецепт 1']['is_in_shopping_cart'])
+        self.assertTrue(recipes['Рецепт 0']['author']['is_subscribed'])
+
+    def test_user_list_queries_do_not_grow_with_page(self):
+        self.create_authors(2)
+        small = self.count_queries('/api/users/?limit=2')
+        self.create_authors(20)
+        large = self.count_queries('/api/users/?limit=22')
+        self.assertEqual(small, large)
+
+
+class SubscriptionsQueryCountTest(QueryCountTestCase):
+
+    def test_subscriptions_queries_do_not_grow_with_page(self):
+        self.create_authors(2)
+        self.create_recipes(4)
+        url = '/api/users/subscriptions/?limit={}&recipes_limit=1'
+        small = self.count_queries(url.format(2))
+        self.create_authors(20)
+        self.create_recipes(40)
+        large = self.count_queries(url.format(22))
+        self.assertEqual(small, large)
+
+    def test_subscriptions_recipes_limit(self):
+        self.create_authors(1)
+        self.create_recipes(3)
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=2'
+        )
+        author = response.data['results'][0]
+        self.assertEqual(len(author['recipes']), 2)
+        self.assertEqual(author['recipes_count'], 3)
+
+    def test_invalid_recipes_limit(self):
+        self.create_authors(1)
+        for value in ('abc', '-1', '1.5'):
+            with self.subTest(recipes_limit=value):
+                response = self.client.get(
+                    f'/api/users/subscriptions/?recipes_limit={value}'
+                )
+                self.assertEqual(response.status_code, 400)
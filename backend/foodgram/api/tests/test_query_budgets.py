@@ -0,0 +1,19 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+
+class QueryBudgetsTest(TestCase):
+    """Бюджеты запросов представлений (query_budgets) соблюдаются."""
+
+    def test_query_budgets(self):
+        stdout, stderr = StringIO(), StringIO()
+        try:
+            call_command(
+                'check_query_budgets', stdout=stdout, stderr=stderr
+            )
+        except CommandError as error:
+            self.fail(f'{error}\n{stderr.getvalue()}')
+        self.assertIn('нарушений нет', stdout.getvalue())
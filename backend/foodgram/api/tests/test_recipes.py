@@ -0,0 +1,121 @@
+import shutil
+import tempfile
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, Recipe
+from .test_queries import QueryCountTestCase
+
+MEDIA_ROOT = tempfile.mkdtemp()
+GIF = (
+    'data:image/gif;base64,'
+    'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
+)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANTS_WORKERS=0)
+class RecipeWriteQueryCountTest(QueryCountTestCase):
+    """Запись рецепта не делает запросов на каждый ингредиент."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Продукт {number}', measurement_unit='г')
+            for number in range(30)
+        )
+        cls.ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def recipe_data(self, count, amount=1):
+        return {
+            'name': f'Рецепт из {count}',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [
+                {'id': pk, 'amount': amount}
+                for pk in self.ingredient_ids[:count]
+            ],
+        }
+
+    def create_queries(self, count):
+        data = dict(self.recipe_data(count), image=GIF)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/recipes/', data, format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.data['ingredients']), count)
+        return len(queries)
+
+    def update_queries(self, count):
+        recipe = Recipe.objects.latest('id')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{recipe.id}/',
+                self.recipe_data(count, amount=2), format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.data['ingredients']), count)
+        return len(queries)
+
+    def test_create_queries_do_not_grow_with_ingredients(self):
+        # Первый вызов создаёт строки версий ресурсов.
+        self.create_queries(2)
+        self.assertEqual(self.create_queries(2), self.create_queries(30))
+
+    def test_update_queries_do_not_grow_with_ingredients(self):
+        self.create_queries(2)
+        self.update_queries(2)
+        small = self.update_queries(2)
+        self.create_queries(30)
+        self.update_queries(30)
+        self.assertEqual(small, self.update_queries(30))
+
+    def commit_queries(self, method, url, data=None):
+        """Запросы вызова вместе с отложенными до коммита сбросами кэшей."""
+        with CaptureQueriesContext(connection) as queries:
+            with self.committed():
+                response = getattr(self.client, method)(
+                    url, data, format='json'
+                )
+        self.assertLess(response.status_code, 300, response.content)
+        return len(queries)
+
+    def test_removing_ingredients_does_not_grow_with_count(self):
+        counts = []
+        # Первый вызов создаёт строки версий ресурсов.
+        for count in (2, 2, 30):
+            self.create_queries(count)
+            recipe = Recipe.objects.latest('id')
+            counts.append(self.commit_queries(
+                'patch', f'/api/recipes/{recipe.id}/', self.recipe_data(1)
+            ))
+        self.assertEqual(counts[1], counts[2])
+
+    def test_delete_does_not_grow_with_ingredients(self):
+        counts = []
+        for count in (2, 2, 30):
+            self.create_queries(count)
+            recipe = Recipe.objects.latest('id')
+            counts.append(self.commit_queries(
+                'delete', f'/api/recipes/{recipe.id}/'
+            ))
+        self.assertEqual(counts[1], counts[2])
+
+    def test_unknown_ingredient(self):
+        data = dict(self.recipe_data(2), image=GIF)
+        data['ingredients'].append({'id': max(self.ingredient_ids) + 1,
+                                    'amount': 1})
+        response = self.client.post('/api/recipes/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ingredients', response.data)
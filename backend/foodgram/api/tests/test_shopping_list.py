@@ -0,0 +1,147 @@
+import csv
+import json
+import re
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (Ingredient, IngredientsAmount, Recipe,
+                            ShoppingCart, ShoppingListItem)
+from users.models import User
+
+
+class ShoppingListTotalsTest(TestCase):
+    """Пересчёт списков покупок по корзинам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(
+                username=f'user_{number}', email=f'user_{number}@example.com'
+            ) for number in range(2)
+        ]
+        recipe = Recipe.objects.create(
+            author=cls.users[0], name='Рецепт', image='recipe_images/x.jpg',
+            text='Описание', cooking_time=1
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        IngredientsAmount.objects.create(
+            recipe=recipe, ingredient=cls.ingredient, amount=10
+        )
+        for user in cls.users:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def test_recipe_in_several_carts(self):
+        key = (self.users[0].id, self.ingredient.id)
+        self.assertEqual(ShoppingListItem.expected_totals()[key], 10)
+        self.assertEqual(
+            ShoppingListItem.expected_totals([self.users[0].id]),
+            {key: 10}
+        )
+
+    def test_rebuild_for_one_user(self):
+        call_command(
+            'rebuild_shopping_lists', '--user', str(self.users[0].id),
+            stdout=StringIO()
+        )
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=self.users[0]).amount, 10
+        )
+
+
+class ShoppingListDownloadTest(TestCase):
+    """Список покупок отдаётся потоком в каждом из форматов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='buyer', email='buyer@example.com'
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', image='recipe_images/x.jpg',
+            text='Описание', cooking_time=1
+        )
+        for name, unit, amount in (
+            ('Сахар', 'г', 50), ('Молоко', 'мл', 200), ('Яйцо', 'шт', 2),
+        ):
+            IngredientsAmount.objects.create(
+                recipe=recipe, amount=amount,
+                ingredient=Ingredient.objects.create(
+                    name=name, measurement_unit=unit
+                ),
+            )
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, file_format):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/',
+            {'file_format': file_format}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'],
+            f'attachment; filename=shopping-list.{file_format}'
+        )
+        return response, b''.join(response.streaming_content)
+
+    def test_txt(self):
+        response, body = self.download('txt')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(body.decode().splitlines(), [
+            'Молоко - 200 мл. ', 'Сахар - 50 г. ', 'Яйцо - 2 шт. ',
+        ])
+
+    def test_csv(self):
+        _, body = self.download('csv')
+        self.assertEqual(list(csv.reader(body.decode().splitlines())), [
+            ['name', 'amount', 'measurement_unit'],
+            ['Молоко', '200', 'мл'],
+            ['Сахар', '50', 'г'],
+            ['Яйцо', '2', 'шт'],
+        ])
+
+    def test_json(self):
+        _, body = self.download('json')
+        self.assertEqual(json.loads(body), [
+            {'name': 'Молоко', 'amount': 200, 'measurement_unit': 'мл'},
+            {'name': 'Сахар', 'amount': 50, 'measurement_unit': 'г'},
+            {'name': 'Яйцо', 'amount': 2, 'measurement_unit': 'шт'},
+        ])
+
+    def test_pdf(self):
+        response, body = self.download('pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(body.startswith(b'%PDF-'))
+        self.assertTrue(body.rstrip().endswith(b'%%EOF'))
+        self.assertIn(b'DejaVuSans', body)
+
+    def test_long_pdf_has_several_pages(self):
+        recipe = Recipe.objects.get()
+        for number in range(120):
+            IngredientsAmount.objects.create(
+                recipe=recipe, amount=1,
+                ingredient=Ingredient.objects.create(
+                    name=f'Продукт {number}', measurement_unit='г'
+                ),
+            )
+        call_command(
+            'rebuild_shopping_lists', '--user', str(self.user.id),
+            stdout=StringIO()
+        )
+        _, body = self.download('pdf')
+        self.assertGreater(len(re.findall(rb'/Type /Page\b', body)), 1)
+
+    def test_unknown_format(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'file_format': 'doc'}
+        )
+        self.assertEqual(response.status_code, 400)
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from . import async_views
 from .views import (TagViewSet, IngredientViewSet,
                     CustomUserViewSet, RecipeViewSet)
 
@@ -18,3 +20,20 @@ urlpatterns = [
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+# Асинхронные версии самых частых чтений (см. api/async_views.py) стоят
+# перед маршрутами роутера и носят те же имена.
+async_urlpatterns = [
+    path('tags/', async_views.tag_list, name='tags-list'),
+    path('tags/<int:pk>/', async_views.tag_detail, name='tags-detail'),
+    path(
+        'ingredients/', async_views.ingredient_list, name='ingredients-list'
+    ),
+    path(
+        'ingredients/<int:pk>/', async_views.ingredient_detail,
+        name='ingredients-detail'
+    ),
+]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
@@ -0,0 +1,113 @@
+import csv
+import json
+import os
+from io import BytesIO
+
+from django.db.models import F
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from recipes.models import ShoppingListItem
+
+
+# Шрифт с кириллицей для PDF лежит в репозитории: в образе может не быть
+# системных шрифтов.
+PDF_FONT = 'DejaVuSans'
+PDF_FONT_PATH = os.path.join(
+    os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf'
+)
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_list_rows(user):
+    """Итератор по итоговому списку покупок пользователя."""
+    return ShoppingListItem.objects.filter(user=user).values(
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+        total=F('amount'),
+    ).order_by('name').iterator()
+
+
+def row_text(row):
+    return f'{row["name"]} - {row["total"]} {row["measurement_unit"]}.'
+
+
+def render_txt(rows):
+    for row in rows:
+        yield f'{row_text(row)} \n'
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for row in rows:
+        yield writer.writerow(
+            (row['name'], row['total'], row['measurement_unit'])
+        )
+
+
+def render_json(rows):
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps({
+            'name': row['name'],
+            'amount': row['total'],
+            'measurement_unit': row['measurement_unit'],
+        }, ensure_ascii=False)
+        separator = ', '
+    yield ']'
+
+
+def render_pdf(rows, title='Список покупок', font_size=11):
+    """Список покупок в PDF формата A4.
+
+    Строки читаются из итератора по мере заполнения страниц, и
+    готовые страницы сжимаются сразу, без списка всех строк в памяти.
+    Таблица ссылок PDF пишется после последней страницы, поэтому байты
+    отдаются частями уже после неё.
+    """
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(PDF_FONT, PDF_FONT_PATH))
+    width, height = A4
+    margin = 20 * mm
+    leading = font_size * 1.4
+    text_width = width - 2 * margin
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    pdf.setTitle(title)
+    pdf.setFont(PDF_FONT, font_size + 5)
+    pdf.drawString(margin, height - margin, title)
+    y = height - margin - 2 * leading
+    pdf.setFont(PDF_FONT, font_size)
+    for row in rows:
+        for line in simpleSplit(row_text(row), PDF_FONT, font_size,
+                                text_width):
+            if y < margin:
+                pdf.showPage()
+                pdf.setFont(PDF_FONT, font_size)
+                y = height - margin
+            pdf.drawString(margin, y, line)
+            y -= leading
+    pdf.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'json': (render_json, 'application/json; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
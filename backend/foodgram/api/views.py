@@ -1,6 +1,6 @@
-from django.db.models.aggregates import Sum
-from django.db.models import BooleanField, Exists, OuterRef, Value
-from django.http import HttpResponse
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -8,30 +8,109 @@ from rest_framework import permissions, status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
 
+from recipes.catalog import get_catalog
 from users.models import Follow, User
-from .pagination import CustomPageNumberPagination
-from .filters import RecipeFilter, IngredientSearchFilter
+from .cache import feed_cache
+from .conditional import conditional_get
+from .instrumentation import timed_serializer
+from .pagination import CachedCountPagination, RecipePagination
+from .relations import EMPTY, get_relations, mark_recipes
+from .filters import IngredientFilter, RecipeFilter
 from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
                             Tag, IngredientsAmount)
+from .utils import SHOPPING_LIST_FORMATS, shopping_list_rows
 from .serializers import (FollowSerializer, IngredientSerializer,
                           CartSerializer, TagSerializer, RecipeSerializer,
-                          FavoriteSerializer, FollowListSerializer)
+                          FavoriteSerializer, FollowListSerializer,
+                          get_recipes_limit)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+USER_FILTERS = {'is_favorited', 'is_in_shopping_cart'}
+
+
+class TimedSerializerMixin:
+    """Замеряет сериализацию для Server-Timing и /metrics.
+
+    Сериализаторы, созданные в обход get_serializer, передаются в
+    timed_serializer явно.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        return timed_serializer(super().get_serializer(*args, **kwargs))
+
+
+class TagViewSet(TimedSerializerMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    # Предельное число SQL-запросов на действие, включая поиск токена и
+    # чтение версий ресурсов; проверяется командой check_query_budgets,
+    # в CI — тестом api/tests/test_query_budgets.py.
+    query_budgets = {'list': 3, 'retrieve': 3}
+
+    @conditional_get('tags')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
+    @conditional_get('tags')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(
+    TimedSerializerMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = IngredientFilter
+    max_limit = 100
+    use_catalog = True
+    query_budgets = {'list': 2, 'retrieve': 2}
 
+    @classmethod
+    def parse_limit(cls, limit):
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            return None
+        return max(0, min(limit, cls.max_limit))
 
-class CustomUserViewSet(UserViewSet):
-    pagination_class = CustomPageNumberPagination
+    def get_limit(self):
+        return self.parse_limit(self.request.query_params.get('limit'))
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        limit = self.get_limit()
+        if self.action != 'list' or limit is None:
+            return queryset
+        return queryset[:limit]
+
+    @conditional_get('ingredients')
+    def list(self, request, *args, **kwargs):
+        if not self.use_catalog:
+            return super().list(request, *args, **kwargs)
+        catalog = get_catalog()
+        name = request.query_params.get('name')
+        if name:
+            return Response(catalog.search(name, self.get_limit()))
+        return Response(catalog.all()[:self.get_limit()])
+
+    @conditional_get('ingredients')
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_catalog:
+            return super().retrieve(request, *args, **kwargs)
+        ingredient = get_catalog().get(kwargs['pk'])
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
+
+
+class CustomUserViewSet(TimedSerializerMixin, UserViewSet):
+    pagination_class = CachedCountPagination
+    query_budgets = {
+        'list': 5, 'retrieve': 4, 'me': 3, 'subscriptions': 5,
+        'subscribe': 9, 'create': 6,
+    }
 
     def get_queryset(self):
         return User.objects.all()
@@ -49,17 +128,45 @@ class CustomUserViewSet(UserViewSet):
         self.get_object = self.get_instance
         return self.retrieve(request, *args, **kwargs)
 
+    @staticmethod
+    def attach_recipes(authors, recipes_limit=None):
+        """Загружает рецепты страницы авторов одним запросом."""
+        recipes = Recipe.objects.filter(author__in=authors)
+        if recipes_limit is not None:
+            ranked = recipes.annotate(
+                rank_in_author=Window(
+                    expression=RowNumber(),
+                    partition_by=[F('author')],
+                    order_by=[F('pub_date').desc(), F('id').desc()],
+                )
+            ).order_by()
+            sql, params = ranked.query.sql_with_params()
+            recipes = Recipe.objects.raw(
+                f'SELECT * FROM ({sql}) ranked '
+                f'WHERE ranked.rank_in_author <= %s '
+                f'ORDER BY ranked.author_id, ranked.rank_in_author',
+                (*params, recipes_limit)
+            )
+        recipes_by_author = {}
+        for recipe in recipes:
+            recipes_by_author.setdefault(recipe.author_id, []).append(recipe)
+        for author in authors:
+            author.limited_recipes = recipes_by_author.get(author.id, [])
+        return authors
+
     @action(methods=['get'], detail=False)
     def subscriptions(self, request):
+        recipes_limit = get_recipes_limit(request)
         subscriptions_list = self.paginate_queryset(
             User.objects.filter(following__user=request.user)
         )
-        serializer = FollowListSerializer(
+        self.attach_recipes(subscriptions_list, recipes_limit)
+        serializer = timed_serializer(FollowListSerializer(
             subscriptions_list, many=True, context={
                 'request': request
             }
-        )
-        return self.get_paginated_response(serializer.data)    
+        ))
+        return self.get_paginated_response(serializer.data)
 
     @action(
         methods=['post', 'delete'], detail=True,
@@ -74,29 +181,40 @@ class CustomUserViewSet(UserViewSet):
             )
             self.perform_destroy(subscription)
             return Response(status=status.HTTP_204_NO_CONTENT)
-        serializer = FollowSerializer(
+        serializer = timed_serializer(FollowSerializer(
             data={
                 'user': request.user.id,
                 'author': get_object_or_404(User, id=id).id
             },
             context={'request': request}
-        )
+        ))
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(TimedSerializerMixin, viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
-    pagination_class = CustomPageNumberPagination
+    # Связи для сериализатора; None — связи пользователя запроса.
+    relations = None
+    pagination_class = RecipePagination
+    count_resources = ('recipes',)
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    query_budgets = {
+        'list': 7, 'retrieve': 6, 'download_shopping_cart': 2,
+        'favorite': 6, 'delete_favorite': 6,
+        'shopping_cart': 13, 'delete_shopping_cart': 13,
+        'create': 14, 'partial_update': 17,
+    }
 
     @staticmethod
     def post_method_for_actions(request, pk, serializers):
         data = {'user': request.user.id, 'recipe': pk}
-        serializer = serializers(data=data, context={'request': request})
+        serializer = timed_serializer(
+            serializers(data=data, context={'request': request})
+        )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -110,26 +228,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_authenticated:
-            queryset = Recipe.objects.annotate(
-                is_favorited=Exists(
-                    user.author_of_favoritting.filter(
-                        recipe__pk=OuterRef('pk')
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    user.author_of_shopping_cart.filter(
-                        recipe__pk=OuterRef('pk')
-                    )
-                ),
-            )
-        else:
-            queryset = Recipe.objects.annotate(
-                is_favorited=Value(False, output_field=BooleanField()),
-                is_in_shopping_cart=Value(False, output_field=BooleanField())
-            )
-        return queryset
+        return Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe',
+                queryset=IngredientsAmount.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['relations'] = self.relations
+        return context
+
+    @conditional_get('recipes', per_user=True)
+    def list(self, request, *args, **kwargs):
+        """Лента без флагов пользователя общая и берётся из кэша.
+
+        Страница сериализуется без связей пользователя, а флаги
+        проставляются после чтения из кэша. Фильтры по избранному и
+        корзине дают у каждого пользователя свою выборку и не кэшируются.
+        """
+        if USER_FILTERS & set(request.query_params):
+            return super().list(request, *args, **kwargs)
+        data = feed_cache.get(request)
+        if data is None:
+            self.relations = EMPTY
+            data = super().list(request, *args, **kwargs).data
+            feed_cache.set(request, data)
+        mark_recipes(data['results'], get_relations(request))
+        return Response(data)
+
+    @conditional_get('recipes', per_user=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -160,32 +294,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(permission_classes=(permissions.IsAuthenticated,), detail=False)
     def download_shopping_cart(self, request, pk=None):
-        user = request.user
-
-        shopping_cart = IngredientsAmount.objects.filter(
-            recipe__shopping_cart__user=user).values(
-                'ingredient__name',
-                'ingredient__measurement_unit').annotate(amount=Sum('amount'))
-        shopping_cart_dict = {}
-        for recipe in shopping_cart:
-            name = recipe['ingredient__name']
-            amount = recipe['amount']
-            measurement_unit = recipe['ingredient__measurement_unit']
-            if name in shopping_cart_dict:
-                shopping_cart_dict[name]['amount'] = (
-                    shopping_cart_dict[name]['amount'] + amount
-                )
-            else:
-                shopping_cart_dict[name] = {
-                    'measurement_unit': measurement_unit,
-                    'amount': amount,
-                }
-        shopping_list = []
-        for key, values in shopping_cart_dict.items():
-            shopping_list.append(
-                f'{key} - {values["amount"]} {values["measurement_unit"]}. \n'
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'errors': f'Формат {file_format} не поддерживается.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        filename = 'shopping-list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        render, content_type = SHOPPING_LIST_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            render(shopping_list_rows(request.user)),
+            content_type=content_type
+        )
+        filename = f'shopping-list.{file_format}'
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.instrumentation_middleware',
+    'recipes.versions.versions_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,10 +89,12 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
     }
 }
 
+AUTH_USER_MODEL = 'users.User'
+
 """DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -98,6 +102,36 @@ DATABASES = {
     }
 }"""
 
+# Кэш ответов и каталогов. Для общего кэша между воркерами укажите, например,
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# с CACHE_LOCATION=/var/tmp/foodgram_cache или Redis-совместимый бэкенд
+# (django_redis.cache.RedisCache из пакета django-redis).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+FEED_CACHE_TIMEOUT = int(os.getenv('FEED_CACHE_TIMEOUT', default=60))
+
+# Время жизни кэша подписок, избранного и корзины пользователя
+# (см. api/relations.py); при их изменении версия в базе меняется, и
+# кэш перестаёт использоваться сразу во всех воркерах.
+RELATIONS_CACHE_TIMEOUT = int(
+    os.getenv('RELATIONS_CACHE_TIMEOUT', default=300)
+)
+
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', default=30)
+)
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD', default=100000)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -141,13 +175,61 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Потоки для сборки уменьшенных картинок рецептов; 0 — собирать сразу
+# после коммита в потоке запроса.
+IMAGE_VARIANTS_WORKERS = int(os.getenv('IMAGE_VARIANTS_WORKERS', default=2))
+
+# Асинхронные списки и карточки тегов и ингредиентов для запуска под ASGI
+# (см. api/async_views.py) и размер пула потоков, в котором они обращаются
+# к базе данных (0 — общий поток синхронного кода Django).
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='False') == 'True'
+ASYNC_VIEWS_WORKERS = int(os.getenv('ASYNC_VIEWS_WORKERS', default=8))
+
+# Заголовок Server-Timing с временем SQL и сериализации (по умолчанию
+# выключен: он раскрывает клиентам детали работы сервера) и порог в
+# миллисекундах, после которого запрос пишется в лог как медленный
+# (0 — не писать).
+SERVER_TIMING = os.getenv('SERVER_TIMING', default='False') == 'True'
+SLOW_REQUEST_THRESHOLD = int(
+    os.getenv('SLOW_REQUEST_THRESHOLD', default=500)
+)
+
+# Сети, из которых доступна страница /metrics, через запятую.
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    'METRICS_ALLOWED_NETWORKS',
+    default='127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+).split(',')
+
+# Ограничения на загружаемые картинки рецептов: размер файла в байтах и
+# число пикселей.
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', default=10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.getenv('RECIPE_IMAGE_MAX_PIXELS', default=40_000_000)
+)
+
+# Кэш токенов аутентификации (см. api/authentication.py): число записей в
+# памяти процесса (0 — не хранить), время жизни в секундах и алиас общего
+# кэша из CACHES (пусто — только память процесса; при нескольких воркерах
+# задайте общий кэш, иначе выход и деактивация дойдут до других воркеров
+# только через TOKEN_CACHE_TIMEOUT).
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', default=1000))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', default=60))
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS', default='') or None
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny'
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
 
@@ -1,12 +1,36 @@
 from django.contrib import admin
 
 from .models import (Favorite, Ingredient, IngredientsAmount, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
+from .paginators import AdminPaginator
+
+
+class IngredientsAmountInline(admin.TabularInline):
+    model = IngredientsAmount
+    autocomplete_fields = ('ingredient',)
+    min_num = 1
+    extra = 0
 
 
 @admin.register(IngredientsAmount)
 class IngredientsAmountAdmin(admin.ModelAdmin):
+    """Только просмотр: состав меняется на странице рецепта, где
+    изменения переносятся в списки покупок."""
+
     list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+    paginator = AdminPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Tag)
@@ -17,20 +41,52 @@ class TagAdmin(admin.ModelAdmin):
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    search_fields = ('^name',)
+    ordering = ('name',)
+    paginator = AdminPaginator
+    show_full_result_count = False
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author')
-    list_filter = ('author', 'name', 'tags',)
+    list_display = ('name', 'author', 'favorites_count')
+    list_select_related = ('author',)
+    list_filter = ('tags',)
+    search_fields = ('name', 'author__username', 'author__email')
+    autocomplete_fields = ('author',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
+    inlines = (IngredientsAmountInline,)
+    paginator = AdminPaginator
+    show_full_result_count = False
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = ShoppingListItem.recipe_amounts(recipe)
+        super().save_related(request, form, formsets, change)
+        ShoppingListItem.update_recipe(
+            recipe, old_amounts, ShoppingListItem.recipe_amounts(recipe)
+        )
+
+    def get_changeform_initial_data(self, request):
+        initial = super().get_changeform_initial_data(request)
+        initial.setdefault('author', request.user.pk)
+        return initial
 
 
 @admin.register(Favorite)
 class FavoriteRecipeAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = AdminPaginator
+    show_full_result_count = False
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = AdminPaginator
+    show_full_result_count = False
@@ -0,0 +1,113 @@
+"""Каталог ингредиентов в памяти процесса.
+
+Таблица ингредиентов небольшая и меняется редко, поэтому автодополнение
+и проверка существования ингредиентов обслуживаются из отсортированных
+массивов. Версия каталога хранится в базе (recipes/versions.py) и
+меняется при сохранении или удалении ингредиента и после загрузки
+командой load_ingredients; каждый процесс читает версию раз за запрос
+и перечитывает каталог, когда видит новую. Массовые изменения в обход
+моделей (UPDATE в SQL, bulk_update) должны вызывать invalidate().
+"""
+from array import array
+from bisect import bisect_left
+from threading import Lock
+
+from . import versions
+
+RESOURCE = 'ingredients'
+
+
+def normalize(value):
+    return value.casefold().strip()
+
+
+def invalidate():
+    """Помечает каталог устаревшим во всех процессах."""
+    versions.bump(RESOURCE)
+
+
+def current_version():
+    return versions.get(RESOURCE)[0]
+
+
+class IngredientCatalog:
+    def __init__(self, rows, version=None):
+        rows = sorted(rows, key=lambda row: (normalize(row[1]), row[0]))
+        self.version = version
+        self.names = [normalize(name) for _, name, _ in rows]
+        self.ids = array('q', (pk for pk, _, _ in rows))
+        self.rows = {
+            pk: {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in rows
+        }
+
+    @classmethod
+    def load(cls, version=None):
+        from recipes.models import Ingredient
+
+        return cls(
+            Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator(),
+            version
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, pk):
+        return self.get(pk) is not None
+
+    def get(self, pk):
+        try:
+            return self.rows.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def all(self):
+        return sorted(self.rows.values(), key=lambda row: row['id'])
+
+    def search(self, value, limit=None):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        value = normalize(value)
+        result = []
+        start = bisect_left(self.names, value)
+        end = start
+        while end < len(self.names) and self.names[end].startswith(value):
+            end += 1
+        result.extend(self.ids[start:end])
+        if limit is None or len(result) < limit:
+            for index, name in enumerate(self.names):
+                if start <= index < end or value not in name:
+                    continue
+                result.append(self.ids[index])
+                if limit is not None and len(result) >= limit:
+                    break
+        if limit is not None:
+            result = result[:limit]
+        return [self.rows[pk] for pk in result]
+
+
+_catalog = None
+_lock = Lock()
+
+
+def loaded_catalog(version):
+    """Уже загруженный каталог версии version или None, без запросов."""
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    return None
+
+
+def get_catalog():
+    """Возвращает актуальный каталог, перечитывая его при смене версии."""
+    global _catalog
+    version = current_version()
+    catalog = loaded_catalog(version)
+    if catalog is not None:
+        return catalog
+    with _lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = IngredientCatalog.load(version)
+        return _catalog
@@ -0,0 +1,24 @@
+"""Денормализованные счётчики рецептов и пользователей."""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def increment(model, pk, field):
+    model.objects.filter(pk=pk).update(**{field: F(field) + 1})
+
+
+def decrement(model, pk, field):
+    model.objects.filter(pk=pk, **{f'{field}__gt': 0}).update(
+        **{field: F(field) - 1}
+    )
+
+
+def count_subquery(model, field):
+    """Подзапрос с числом строк model, ссылающихся на внешний pk."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
@@ -0,0 +1,189 @@
+"""Уменьшенные копии картинок рецептов.
+
+Для каждой картинки строятся варианты из VARIANTS в форматах WebP и
+JPEG. Имя файла содержит хэш его содержимого, поэтому файлы не
+меняются и могут кэшироваться клиентами бессрочно. Сборка выполняется
+в фоновом пуле потоков после коммита транзакции; при
+IMAGE_VARIANTS_WORKERS = 0 варианты строятся сразу. Файлы прежних
+вариантов удаляются тем же порядком после замены картинки и удаления
+рецепта, если на них не ссылается другой рецепт.
+"""
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+UPLOAD_TO = 'recipe_images/variants/'
+
+_executor = None
+
+
+def render(image, size, file_format):
+    """Возвращает байты картинки, вписанной в size, в формате file_format."""
+    pil_format, options = FORMATS[file_format]
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    copy.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def store(content, name, file_format):
+    """Сохраняет файл под именем из хэша содержимого и возвращает путь."""
+    digest = hashlib.sha1(content).hexdigest()[:16]
+    path = f'{UPLOAD_TO}{name}/{digest}.{file_format}'
+    if not default_storage.exists(path):
+        path = default_storage.save(path, ContentFile(content))
+    return path
+
+
+def build(source):
+    """Строит все варианты картинки source (поле ImageField)."""
+    with source.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert('RGB')
+    variants = {'source': source.name}
+    for name, size in VARIANTS.items():
+        variants[name] = {
+            file_format: store(render(image, size, file_format),
+                               name, file_format)
+            for file_format in FORMATS
+        }
+    return variants
+
+
+def build_for_recipe(recipe_id):
+    """Строит варианты картинки рецепта и сохраняет их пути.
+
+    Если за время сборки картинку заменили, результат не записывается:
+    новую картинку соберёт её собственная задача.
+    """
+    from .models import Recipe
+
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_variants'
+    ).first()
+    if recipe is None or not recipe.image:
+        return None
+    variants = build(recipe.image)
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_variants=variants)
+    if updated:
+        versions.bump('recipes')
+        delete_unused(
+            variant_paths(recipe.image_variants) - variant_paths(variants)
+        )
+    return variants
+
+
+def variant_paths(variants):
+    """Пути всех файлов вариантов из значения Recipe.image_variants."""
+    return {
+        path
+        for name in VARIANTS
+        for path in (variants or {}).get(name, {}).values()
+    }
+
+
+def delete_unused(paths):
+    """Удаляет файлы из paths, на которые не ссылается ни один рецепт.
+
+    Одинаковые картинки разных рецептов делят файлы вариантов, поэтому
+    файлы, которые ещё используются, остаются.
+    """
+    from .models import Recipe
+
+    if not paths:
+        return
+    references = Q()
+    for name in VARIANTS:
+        for file_format in FORMATS:
+            references |= Q(**{
+                f'image_variants__{name}__{file_format}__in': list(paths)
+            })
+    used = set()
+    for variants in Recipe.objects.filter(references).values_list(
+        'image_variants', flat=True
+    ):
+        used |= variant_paths(variants)
+    for path in paths - used:
+        default_storage.delete(path)
+
+
+def _build(recipe_id):
+    try:
+        build_for_recipe(recipe_id)
+    except Exception:
+        logger.exception('Не удалось собрать картинки рецепта %s', recipe_id)
+
+
+def _delete(paths):
+    try:
+        delete_unused(paths)
+    except Exception:
+        logger.exception('Не удалось удалить картинки %s', sorted(paths))
+
+
+def _run(task, argument):
+    try:
+        task(argument)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANTS_WORKERS,
+            thread_name_prefix='image-variants',
+        )
+    return _executor
+
+
+def _schedule(task, argument):
+    if not settings.IMAGE_VARIANTS_WORKERS:
+        transaction.on_commit(lambda: task(argument))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(_run, task, argument)
+    )
+
+
+def schedule(recipe_id):
+    """Ставит сборку вариантов в очередь после коммита транзакции."""
+    _schedule(_build, recipe_id)
+
+
+def schedule_delete(variants):
+    """Ставит удаление файлов вариантов в очередь после коммита."""
+    paths = variant_paths(variants)
+    if paths:
+        _schedule(_delete, paths)
+
+
+def is_stale(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') != recipe.image.name
+    )
@@ -0,0 +1,95 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает фильтрацию is_favorited/is_in_shopping_cart через '
+        'аннотацию Exists и через соединение со строками пользователя '
+        'на синтетических рецептах. Все вставленные строки откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Вывести планы запросов.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.generate(options)
+            for title, model, lookup in (
+                ('is_favorited', Favorite, 'favoritting__user'),
+                ('is_in_shopping_cart', ShoppingCart, 'shopping_cart__user'),
+            ):
+                annotated = Recipe.objects.annotate(flag=Exists(
+                    model.objects.filter(user=user, recipe=OuterRef('pk'))
+                )).filter(flag=True)
+                joined = Recipe.objects.filter(**{lookup: user})
+                for plan, queryset in (
+                    ('annotation', annotated), ('join', joined)
+                ):
+                    page = queryset.order_by('-pub_date')[:options['limit']]
+                    timings = self.measure(page, options['repeat'])
+                    self.stdout.write(
+                        f'{title} {plan}: '
+                        f'p50={statistics.median(timings):.2f} ms '
+                        f'max={max(timings):.2f} ms'
+                    )
+                    if options['explain']:
+                        self.stdout.write(page.explain())
+            transaction.set_rollback(True)
+
+    def generate(self, options):
+        author = User.objects.create(
+            username='bench_author', email='bench_author@example.com'
+        )
+        user = User.objects.create(
+            username='bench_user', email='bench_user@example.com'
+        )
+        created = 0
+        while created < options['recipes']:
+            size = min(options['batch_size'], options['recipes'] - created)
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=author, name=f'Рецепт {created + number}',
+                    image='recipe_images/bench.jpg', text='',
+                    cooking_time=1
+                ) for number in range(size)
+            )
+            created += size
+        recipe_ids = Recipe.objects.filter(author=author).order_by(
+            '?'
+        ).values_list('id', flat=True)[:options['favorites']]
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe_id=pk) for pk in recipe_ids
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe_id=pk) for pk in recipe_ids
+        )
+        self.stdout.write(
+            f'Рецептов: {created}, в избранном и корзине: {len(recipe_ids)}'
+        )
+        return user
+
+    @staticmethod
+    def measure(queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
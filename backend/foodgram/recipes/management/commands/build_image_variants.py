@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes import images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Собирает уменьшенные копии картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересобрать копии и для рецептов, у которых они уже есть.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'image', 'image_variants'
+        ).order_by('pk')
+        built = failed = 0
+        for recipe in recipes.iterator():
+            if not options['all'] and not images.is_stale(recipe):
+                continue
+            try:
+                images.build_for_recipe(recipe.pk)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+            else:
+                built += 1
+        self.stdout.write(f'Собрано: {built}, ошибок: {failed}')
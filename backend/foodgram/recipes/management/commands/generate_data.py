@@ -0,0 +1,218 @@
+import random
+from itertools import accumulate
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes import catalog, versions
+from recipes.models import (Favorite, Ingredient, IngredientsAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+PREFIX = 'synthetic_'
+SYLLABLES = ('ка', 'ро', 'ми', 'ла', 'ту', 'не', 'со', 'па', 'ви', 'жу')
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+
+
+def zipf_weights(size, exponent):
+    """Накопленные веса степенного распределения для random.choices."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует воспроизводимый набор данных: пользователей, рецепты, '
+        'подписки, избранное и корзины. Одинаковый --seed даёт одинаковые '
+        'данные. Счётчики и списки покупок пересчитываются в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Сколько ингредиентов создать, если таблица пуста.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить ранее сгенерированных пользователей и их данные.'
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        generated = User.objects.filter(username__startswith=PREFIX)
+        if options['clear']:
+            deleted, _ = generated.delete()
+            self.stdout.write(f'Удалено объектов: {deleted}')
+        elif generated.exists():
+            raise CommandError(
+                'Сгенерированные данные уже есть; добавьте --clear.'
+            )
+        with transaction.atomic():
+            tag_ids = self.tags()
+            ingredient_ids = self.ingredients(options['ingredients'])
+            user_ids = self.users(options['users'])
+            recipe_ids = self.recipes(
+                options['recipes'], user_ids, tag_ids, ingredient_ids
+            )
+            self.follows(user_ids)
+            self.favorites(user_ids, recipe_ids)
+        call_command('recount', stdout=self.stdout)
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        catalog.invalidate()
+        versions.bump('recipes')
+        versions.bump('tags')
+
+    def insert(self, model, objects):
+        """Вставляет объекты пачками, не держа их все в памяти."""
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def tags(self):
+        if not Tag.objects.exists():
+            self.insert(Tag, [
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in TAGS
+            ])
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def ingredients(self, count):
+        """Настоящие ингредиенты загружает load_ingredients; если таблица
+        пуста, создаются слова из слогов с разными префиксами."""
+        if not Ingredient.objects.exists():
+            units = ('г', 'кг', 'мл', 'шт.', 'ст. л.', 'по вкусу')
+            self.insert(Ingredient, [
+                Ingredient(
+                    name=''.join(
+                        SYLLABLES[number // 10 ** power % 10]
+                        for power in range(3)
+                    ) + f' {number}',
+                    measurement_unit=units[number % len(units)]
+                ) for number in range(count)
+            ])
+        return list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+
+    def users(self, count):
+        self.insert(User, [
+            User(
+                username=f'{PREFIX}{number}',
+                email=f'{PREFIX}{number}@example.com',
+                first_name='Пользователь', last_name=str(number),
+                password='!'
+            ) for number in range(count)
+        ])
+        self.stdout.write(f'Пользователей: {count}')
+        return list(User.objects.filter(
+            username__startswith=PREFIX
+        ).order_by('id').values_list('id', flat=True))
+
+    def recipes(self, count, user_ids, tag_ids, ingredient_ids):
+        """Авторы и ингредиенты выбираются по степенному закону."""
+        author_weights = zipf_weights(len(user_ids), 1.1)
+        self.insert(Recipe, (
+            Recipe(
+                author_id=self.random.choices(
+                    user_ids, cum_weights=author_weights
+                )[0],
+                name=f'Рецепт {number}',
+                image='recipe_images/synthetic.jpg',
+                text='Описание рецепта. ' * self.random.randint(1, 20),
+                cooking_time=self.random.randint(5, 180)
+            ) for number in range(count)
+        ))
+        recipe_ids = list(Recipe.objects.filter(
+            author__username__startswith=PREFIX
+        ).order_by('id').values_list('id', flat=True))
+        ingredient_weights = zipf_weights(len(ingredient_ids), 0.9)
+        recipe_ingredients = {}
+        for recipe_id in recipe_ids:
+            size = min(
+                max(1, round(self.random.gauss(7, 3))), len(ingredient_ids)
+            )
+            chosen = set()
+            while len(chosen) < size:
+                chosen.update(self.random.choices(
+                    ingredient_ids, cum_weights=ingredient_weights,
+                    k=size - len(chosen)
+                ))
+            recipe_ingredients[recipe_id] = sorted(chosen)
+        self.insert(IngredientsAmount, (
+            IngredientsAmount(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=self.random.choice((1, 2, 3, 5, 10, 50, 100, 200))
+            )
+            for recipe_id, chosen in recipe_ingredients.items()
+            for ingredient_id in chosen
+        ))
+        self.insert(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.random.sample(
+                tag_ids, self.random.randint(1, len(tag_ids))
+            )
+        ))
+        self.stdout.write(
+            f'Рецептов: {len(recipe_ids)}, ингредиентов в рецептах: '
+            f'{sum(map(len, recipe_ingredients.values()))}'
+        )
+        return recipe_ids
+
+    def follows(self, user_ids):
+        """Граф подписок: популярность авторов по степенному закону."""
+        weights = zipf_weights(len(user_ids), 1.2)
+        follows = []
+        for user_id in user_ids:
+            count = min(int(self.random.paretovariate(1.5)), len(user_ids))
+            authors = sorted(set(self.random.choices(
+                user_ids, cum_weights=weights, k=count
+            )) - {user_id})
+            follows.extend(
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in authors
+            )
+        self.insert(Follow, follows)
+        self.stdout.write(f'Подписок: {len(follows)}')
+
+    def favorites(self, user_ids, recipe_ids):
+        weights = zipf_weights(len(recipe_ids), 1.0)
+        favorites, carts = [], []
+        for user_id in user_ids:
+            favorite_count = min(
+                int(self.random.paretovariate(1.2)) - 1, len(recipe_ids)
+            )
+            favorites.extend(
+                Favorite(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in sorted(set(self.random.choices(
+                    recipe_ids, cum_weights=weights, k=favorite_count
+                )))
+            )
+            carts.extend(
+                ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in sorted(set(self.random.choices(
+                    recipe_ids, cum_weights=weights,
+                    k=self.random.randint(0, 8)
+                )))
+            )
+        self.insert(Favorite, favorites)
+        self.insert(ShoppingCart, carts)
+        self.stdout.write(
+            f'В избранном: {len(favorites)}, в корзинах: {len(carts)}'
+        )
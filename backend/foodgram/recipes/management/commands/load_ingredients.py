@@ -1,30 +1,151 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from recipes import catalog
 from recipes.models import Ingredient
 
+HEADER = ['name', 'measurement_unit']
 
-def ingredient_create(row):
-    Ingredient.objects.get_or_create(
-        name=row[0],
-        measurement_unit=row[1],
-    )
+
+def read_csv(f):
+    for row in csv.reader(f):
+        if not row or row == HEADER:
+            continue
+        yield row[0], row[1]
+
+
+def read_json(f):
+    for item in json.load(f):
+        yield item['name'], item['measurement_unit']
 
 
-action = {
-    "ingredients.csv": ingredient_create,
+readers = {
+    'csv': read_csv,
+    'json': read_json,
 }
 
 
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_bulk(batch):
+    Ingredient.objects.bulk_create(
+        [
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in batch
+        ],
+        ignore_conflicts=True
+    )
+
+
+def insert_copy(batch):
+    """COPY во временную таблицу и вставка без конфликтов (PostgreSQL)."""
+    table = Ingredient._meta.db_table
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(batch)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS ingredient_staging '
+            '(name varchar(200), measurement_unit varchar(200)) '
+            'ON COMMIT DROP'
+        )
+        cursor.cursor.copy_expert(
+            'COPY ingredient_staging (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            f'SELECT DISTINCT ON (name) name, measurement_unit '
+            f'FROM ingredient_staging '
+            f'ON CONFLICT (name) DO NOTHING'
+        )
+        cursor.execute('TRUNCATE ingredient_staging')
+
+
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON пакетами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'data/ingredients.csv'),
+            help='Путь к файлу с ингредиентами.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=readers.keys(),
+            help='Формат файла; по умолчанию определяется по расширению.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загружать через COPY (только PostgreSQL).'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только прочитать файл, ничего не записывая.'
+        )
+
     def handle(self, *args, **options):
-        path = os.path.join(settings.BASE_DIR, "data/")
-        for key in action.keys():
-            with open(path + key, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                next(reader)
-                for row in reader:
-                    action[key](row)
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.')
+        )
+        if file_format not in readers:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только в PostgreSQL.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0.')
+        insert = insert_copy if options['copy'] else insert_bulk
+        started = time.perf_counter()
+        before = Ingredient.objects.count()
+        read = 0
+        with open(path, 'r', encoding='utf-8') as f, transaction.atomic():
+            rows = readers[file_format](f)
+            for batch in batches(rows, options['batch_size']):
+                read += len(batch)
+                if not options['dry_run']:
+                    insert(batch)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'\rПрочитано {read} строк ({read / elapsed:.0f}/с)',
+                    ending=''
+                )
+        elapsed = time.perf_counter() - started
+        self.stdout.write('')
+        if options['dry_run']:
+            self.stdout.write(
+                f'Dry run: {read} строк за {elapsed:.2f} с, '
+                f'записи не выполнялись.'
+            )
+            return
+        created = Ingredient.objects.count() - before
+        # bulk_create и COPY не вызывают сигналы модели, поэтому версия
+        # каталога меняется здесь, уже после коммита. Версия хранится в
+        # базе, и работающие серверы перечитают каталог при следующем
+        # запросе.
+        catalog.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано {read} строк, добавлено {created} за {elapsed:.2f} с '
+            f'({read / elapsed:.0f} строк/с). Серверы получат новый каталог '
+            f'при следующем запросе.'
+        ))
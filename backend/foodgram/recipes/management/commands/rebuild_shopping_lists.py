@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает или проверяет итоговые списки покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить списки с корзинами, ничего не меняя.'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='id пользователя; можно указать несколько раз.'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        items = ShoppingListItem.objects.all()
+        if user_ids:
+            items = items.filter(user__in=user_ids)
+        expected = ShoppingListItem.expected_totals(user_ids)
+        actual = {
+            (user, ingredient): amount
+            for user, ingredient, amount in items.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        }
+        mismatched = {
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        }
+        if options['verify']:
+            for user, ingredient in sorted(mismatched):
+                self.stdout.write(
+                    f'user={user} ingredient={ingredient}: '
+                    f'ожидается {expected.get((user, ingredient), 0)}, '
+                    f'в списке {actual.get((user, ingredient), 0)}'
+                )
+            self.stdout.write(f'Расхождений: {len(mismatched)}')
+            return
+        with transaction.atomic():
+            items.delete()
+            ShoppingListItem.objects.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user, ingredient_id=ingredient, amount=amount
+                    )
+                    for (user, ingredient), amount in expected.items()
+                ),
+                batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, исправлено позиций: '
+            f'{len(mismatched)}'
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.counters import count_subquery
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать число расхождений.'
+        )
+
+    def handle(self, *args, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            actual = count_subquery(related_model, related_field)
+            drifted = list(
+                model.objects.annotate(actual=actual).exclude(
+                    **{field: F('actual')}
+                ).values_list('pk', flat=True)
+            )
+            if drifted and not options['dry_run']:
+                model.objects.filter(pk__in=drifted).update(**{field: actual})
+            self.stdout.write(
+                f'{model.__name__}.{field}: расхождений {len(drifted)}'
+            )
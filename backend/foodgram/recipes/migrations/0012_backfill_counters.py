@@ -0,0 +1,44 @@
+# Generated by Django 3.2.14 on 2026-10-19 12:00
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    """Заполняет счётчики рецептов по существующим строкам.
+
+    Счётчики пользователей заполняет команда recount после миграций
+    users, которые создаются при деплое.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        # В истории миграций модель избранного называется FavoriteRecipe.
+        favorites_count=count_subquery(
+            apps.get_model('recipes', 'FavoriteRecipe'), 'recipe'
+        ),
+        in_carts_count=count_subquery(
+            apps.get_model('recipes', 'ShoppingCart'), 'recipe'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_resourceversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.14 on 2026-10-18 19:48
+
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0012_backfill_counters'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='FavoriteRecipe',
+            new_name='Favorite',
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.core.validators import MinValueValidator
 
 from users.models import User
@@ -77,6 +77,11 @@ class Recipe(models.Model):
         verbose_name='Картинка',
         upload_to='recipe_images/'
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание рецепта'
     )
@@ -89,11 +94,27 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -183,3 +204,170 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """Модель итогового списка покупок пользователя.
+
+    Хранит суммарное количество каждого ингредиента по всем рецептам
+    в корзине. Добавление и удаление рецептов из корзины, в том числе
+    каскадное и через админку, учитывают сигналы (recipes/signals.py),
+    изменение состава — RecipeSerializer.update и RecipeAdmin.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient_shopping_list'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient}'
+
+    @classmethod
+    def apply_delta(cls, user_ids, deltas):
+        """Прибавляет deltas {ingredient_id: amount} к спискам users.
+
+        select_for_update блокирует только существующие строки: если
+        параллельная транзакция успела создать ту же позицию, вставка
+        нарушает уникальность, и применение повторяется уже с её строкой.
+        """
+        deltas = {
+            ingredient: delta
+            for ingredient, delta in deltas.items() if delta
+        }
+        user_ids = list(user_ids)
+        if not user_ids or not deltas:
+            return
+        try:
+            cls._apply_delta(user_ids, deltas)
+        except IntegrityError:
+            cls._apply_delta(user_ids, deltas)
+
+    @classmethod
+    def _apply_delta(cls, user_ids, deltas):
+        with transaction.atomic():
+            existing = {
+                (item.user_id, item.ingredient_id): item
+                for item in cls.objects.select_for_update().filter(
+                    user__in=user_ids, ingredient__in=deltas
+                )
+            }
+            to_create, to_update, to_delete = [], [], []
+            for user_id in user_ids:
+                for ingredient_id, delta in deltas.items():
+                    item = existing.get((user_id, ingredient_id))
+                    if item is None:
+                        if delta > 0:
+                            to_create.append(cls(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                amount=delta
+                            ))
+                    elif item.amount + delta > 0:
+                        item.amount += delta
+                        to_update.append(item)
+                    else:
+                        to_delete.append(item.pk)
+            cls.objects.bulk_create(to_create)
+            cls.objects.bulk_update(to_update, ['amount'])
+            cls.objects.filter(pk__in=to_delete).delete()
+
+    @classmethod
+    def recipe_amounts(cls, recipe):
+        return dict(
+            IngredientsAmount.objects.filter(recipe=recipe).values_list(
+                'ingredient_id', 'amount'
+            )
+        )
+
+    @classmethod
+    def add_recipe(cls, user_id, recipe_id):
+        cls.apply_delta([user_id], cls.recipe_amounts(recipe_id))
+
+    @classmethod
+    def remove_amounts(cls, user_id, amounts):
+        cls.apply_delta([user_id], {
+            ingredient: -amount for ingredient, amount in amounts.items()
+        })
+
+    @classmethod
+    def update_recipe(cls, recipe, old_amounts, new_amounts):
+        """Переносит изменение состава рецепта в списки покупок."""
+        cls.apply_delta(
+            recipe.shopping_cart.values_list('user_id', flat=True),
+            {
+                ingredient: (
+                    new_amounts.get(ingredient, 0)
+                    - old_amounts.get(ingredient, 0)
+                )
+                for ingredient in old_amounts.keys() | new_amounts.keys()
+            }
+        )
+
+    @classmethod
+    def expected_totals(cls, user_ids=None):
+        """Пересчитывает списки покупок по корзинам: {(user, ingr): amount}."""
+        # Одно условие — одно соединение с корзинами: второй filter()
+        # по той же связи добавил бы ещё одно и умножил суммы на число
+        # корзин с рецептом.
+        if user_ids is None:
+            rows = IngredientsAmount.objects.filter(
+                recipe__shopping_cart__isnull=False
+            )
+        else:
+            rows = IngredientsAmount.objects.filter(
+                recipe__shopping_cart__user__in=user_ids
+            )
+        return {
+            (row['recipe__shopping_cart__user'], row['ingredient']):
+                row['total']
+            for row in rows.values(
+                'recipe__shopping_cart__user', 'ingredient'
+            ).annotate(total=models.Sum('amount')).order_by().iterator()
+        }
+
+
+class ResourceVersion(models.Model):
+    """Версия ресурса для сброса кэшей и условных GET-запросов.
+
+    Хранится в базе, чтобы смену версии видели все процессы и воркеры.
+    """
+    resource = models.CharField(
+        primary_key=True,
+        max_length=100,
+        verbose_name='Ресурс'
+    )
+    stamp = models.CharField(
+        max_length=32,
+        verbose_name='Метка'
+    )
+    modified = models.DateTimeField(
+        verbose_name='Время изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Версия ресурса'
+        verbose_name_plural = 'Версии ресурсов'
+
+    def __str__(self):
+        return f'{self.resource} {self.stamp}'
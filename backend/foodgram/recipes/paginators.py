@@ -0,0 +1,126 @@
+"""Paginator с дешёвым подсчётом объектов для API и админки."""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (EmptyPage, Page, PageNotAnInteger,
+                                   Paginator)
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class NoCountPage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def end_index(self):
+        # Page.end_index на последней странице возвращает paginator.count,
+        # которого без подсчёта нет.
+        return self.start_index() + len(self.object_list) - 1
+
+
+class CountingPaginator(Paginator):
+    """Paginator с кэшируемым, оценочным или отключённым COUNT.
+
+    count_key — ключ кэша для числа объектов; estimate_threshold — начиная
+    с какой оценки планировщика PostgreSQL возвращать её вместо точного
+    COUNT; skip_count — не считать объекты вовсе, а определять наличие
+    следующей страницы по лишней строке.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None,
+                 count_timeout=30, estimate_threshold=None,
+                 skip_count=False, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.count_timeout = count_timeout
+        self.estimate_threshold = estimate_threshold
+        self.skip_count = skip_count
+
+    @cached_property
+    def count(self):
+        if self.skip_count:
+            return None
+        if self.count_key:
+            count = cache.get(self.count_key)
+            if count is not None:
+                return count
+        count = self.estimate()
+        if count is None or count < self.estimate_threshold:
+            count = super().count
+        if self.count_key:
+            cache.set(self.count_key, count, self.count_timeout)
+        return count
+
+    def estimate(self):
+        """Оценка числа строк планировщиком PostgreSQL или None."""
+        queryset = self.object_list
+        if self.estimate_threshold is None or not hasattr(queryset, 'query'):
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @property
+    def num_pages(self):
+        """Без подсчёта — число страниц, о которых известно после page()."""
+        if self.skip_count:
+            return getattr(self, 'known_pages', 1)
+        return super().num_pages
+
+    def page(self, number):
+        if not self.skip_count:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        items = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not items and number > 1:
+            raise EmptyPage('That page contains no results')
+        self.known_pages = number + (len(items) > self.per_page)
+        return NoCountPage(
+            items[:self.per_page], number, self,
+            has_next=len(items) > self.per_page
+        )
+
+    def validate_number(self, number):
+        if not self.skip_count:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+
+class AdminPaginator(CountingPaginator):
+    """Paginator админки: оценка планировщика вместо COUNT по большим
+    таблицам."""
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True):
+        super().__init__(
+            object_list, per_page, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            estimate_threshold=getattr(
+                settings, 'PAGINATION_COUNT_ESTIMATE_THRESHOLD', None
+            ),
+        )
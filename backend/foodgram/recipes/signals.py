@@ -0,0 +1,86 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import User
+from . import catalog, counters, images, versions
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                     ShoppingListItem, Tag)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_catalog(**kwargs):
+    versions.on_commit_once(catalog.invalidate)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(**kwargs):
+    versions.bump_on_commit('tags')
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(instance, created, **kwargs):
+    if created:
+        counters.increment(Recipe, instance.recipe_id, 'favorites_count')
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(instance, **kwargs):
+    counters.decrement(Recipe, instance.recipe_id, 'favorites_count')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increment_in_carts_count(instance, created, **kwargs):
+    if created:
+        counters.increment(Recipe, instance.recipe_id, 'in_carts_count')
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_in_carts_count(instance, **kwargs):
+    counters.decrement(Recipe, instance.recipe_id, 'in_carts_count')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    if created:
+        ShoppingListItem.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remember_shopping_list_amounts(instance, **kwargs):
+    """Состав запоминается до удаления: при удалении рецепта его
+    ингредиенты удаляются каскадом раньше, чем придёт post_delete."""
+    instance.shopping_list_amounts = ShoppingListItem.recipe_amounts(
+        instance.recipe_id
+    )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    ShoppingListItem.remove_amounts(
+        instance.user_id, getattr(instance, 'shopping_list_amounts', {})
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created and instance.author_id:
+        counters.increment(User, instance.author_id, 'recipes_count')
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    if instance.author_id:
+        counters.decrement(User, instance.author_id, 'recipes_count')
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_variants(instance, **kwargs):
+    if images.is_stale(instance):
+        images.schedule(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(instance, **kwargs):
+    images.schedule_delete(instance.image_variants)
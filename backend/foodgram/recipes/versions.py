@@ -0,0 +1,122 @@
+"""Версии ресурсов для сброса кэшей и условных GET-запросов.
+
+Версия — пара (метка, время изменения) в таблице ResourceVersion;
+метка заменяется при каждом изменении ресурса. Кэш Django по умолчанию
+живёт в памяти процесса, поэтому версии хранятся в базе: новую версию
+сразу видят все воркеры и процессы, в том числе management-команды.
+Внутри HTTP-запроса прочитанные версии запоминаются (versions_middleware),
+чтобы каждая читалась не больше одного раза.
+"""
+import asyncio
+from contextvars import ContextVar
+from uuid import uuid4
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
+
+from .models import ResourceVersion
+
+request_versions = ContextVar('request_versions', default=None)
+
+
+def get(resource):
+    """Возвращает (метку, время изменения) ресурса."""
+    return get_many([resource])[resource]
+
+
+def get_many(resources):
+    """Версии нескольких ресурсов одним запросом: {ресурс: версия}."""
+    memo = request_versions.get()
+    found = {
+        resource: memo[resource]
+        for resource in resources if memo is not None and resource in memo
+    }
+    missing = [resource for resource in resources if resource not in found]
+    if missing:
+        found.update(
+            (resource, (stamp, modified))
+            for resource, stamp, modified in ResourceVersion.objects.filter(
+                pk__in=missing
+            ).values_list('resource', 'stamp', 'modified')
+        )
+    for resource in resources:
+        if resource not in found:
+            row, _ = ResourceVersion.objects.get_or_create(
+                resource=resource,
+                defaults={'stamp': uuid4().hex, 'modified': timezone.now()}
+            )
+            found[resource] = (row.stamp, row.modified)
+    if memo is not None:
+        memo.update(found)
+    return found
+
+
+def bump(resource):
+    """Помечает ресурс изменённым."""
+    version = (uuid4().hex, timezone.now())
+    values = {'stamp': version[0], 'modified': version[1]}
+    if not ResourceVersion.objects.filter(pk=resource).update(**values):
+        try:
+            with transaction.atomic():
+                ResourceVersion.objects.create(resource=resource, **values)
+        except IntegrityError:
+            ResourceVersion.objects.filter(pk=resource).update(**values)
+    memo = request_versions.get()
+    if memo is not None:
+        memo[resource] = version
+
+
+def on_commit_once(func, using=None):
+    """transaction.on_commit, не повторяющий равный func в транзакции.
+
+    Сигналы приходят на каждую строку (удаление рецепта удаляет все его
+    ингредиенты), а сбросу кэша достаточно одного вызова после коммита.
+    """
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block and any(
+        entry[1] == func for entry in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(func, using)
+
+
+class Bump:
+    """Отложенный bump(resource); равен другому Bump того же ресурса."""
+
+    def __init__(self, resource):
+        self.resource = resource
+
+    def __call__(self):
+        bump(self.resource)
+
+    def __eq__(self, other):
+        return isinstance(other, Bump) and other.resource == self.resource
+
+    def __hash__(self):
+        return hash(self.resource)
+
+
+def bump_on_commit(resource, using=None):
+    """Меняет версию ресурса после коммита, один раз на транзакцию."""
+    on_commit_once(Bump(resource), using)
+
+
+@sync_and_async_middleware
+def versions_middleware(get_response):
+    """Запоминает прочитанные версии на время запроса."""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = request_versions.set({})
+            try:
+                return await get_response(request)
+            finally:
+                request_versions.reset(token)
+    else:
+        def middleware(request):
+            token = request_versions.set({})
+            try:
+                return get_response(request)
+            finally:
+                request_versions.reset(token)
+    return middleware
@@ -1,10 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from recipes.paginators import AdminPaginator
 from .models import Follow, User
 
-admin.site.unregister(User)
-
 
 @admin.register(User)
 class UserAdmin(UserAdmin):
@@ -15,8 +14,13 @@ class UserAdmin(UserAdmin):
         'username',
         'first_name',
         'last_name',
+        'recipes_count',
+        'followers_count',
     )
-    list_filter = ('email', 'username',)
+    list_filter = ('is_staff', 'is_active')
+    readonly_fields = ('recipes_count', 'followers_count')
+    paginator = AdminPaginator
+    show_full_result_count = False
 
 
 @admin.register(Follow)
@@ -24,3 +28,7 @@ class FollowAdmin(admin.ModelAdmin):
     """Модель администрирование подписок."""
 
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    paginator = AdminPaginator
+    show_full_result_count = False
@@ -23,6 +23,16 @@ class User(AbstractUser):
         max_length=150,
         verbose_name='Фамилия'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков'
+    )
 
     class Meta:
         ordering = ('username',)
@@ -61,4 +71,4 @@ class Follow(models.Model):
         ]
 
     def __str__(self):
-        return self.user
+        return f'{self.user} {self.author}'